@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation; either version 2 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA, 02111-1307.
+
+"""Play many seeded games automatically and report aggregate statistics.
+
+Usage: python batch.py [options] [COLSxROWS/MINES ...]
+
+Games are spread across a multiprocessing pool in chunks.  After every
+chunk, one JSON object is written per line to standard output with the
+running totals for that board configuration: win rate, mean number of
+moves in won games, and a histogram of cascade sizes.  The last line for
+each configuration has "done" set to true.
+"""
+
+import random, sys
+from multiprocessing import Pool
+from optparse import OptionParser
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from game import Field
+from solver import Solver
+
+
+def _bucket(size):
+    """Return the histogram bucket for a cascade of the given size.
+
+    Buckets are powers of two; each holds the sizes greater than half of it
+    and no greater than it.
+    """
+    bucket = 1
+    while bucket < size:
+        bucket = bucket * 2
+    return bucket
+
+
+def auto_play(field, rng):
+    """Play a game on the given field until it is won or lost.
+
+    The player opens a random tile, then asks a Solver for the tiles that
+    are certainly safe or certainly mines, flags the mines and opens the
+    safe tiles.  When nothing can be deduced, a random unknown tile is
+    opened.
+
+    field is a fresh Field; rng is the random.Random instance used for
+    guesses.  The function returns a 3-tuple: whether the game was won, the
+    number of moves made, and the sizes of all non-empty opens.
+    """
+    rows = field.rows
+    cols = field.cols
+    solver = Solver(field)
+    moves = 0
+    cascades = []
+
+    def play_open(x, y):
+        opened = field.open(x, y)
+        if opened:
+            cascades.append(len(opened))
+            solver.update(opened)
+            for coords, count in opened:
+                if count == -1:
+                    field.lose = 1
+
+    while not field.won():
+        safe, mines = solver.solve()
+        for x, y in mines:
+            field.flag(x, y)
+            moves = moves + 1
+        for x, y in safe:
+            play_open(x, y)
+            moves = moves + 1
+        if safe or mines:
+            continue
+
+        states = field.states
+        unknown = [divmod(index, rows) for index in xrange(rows * cols)
+                   if states[index] == 0]
+        if field.cleared == rows * cols - field.mines:
+            # Only mines are left; flag them all.
+            for x, y in unknown:
+                field.flag(x, y)
+                moves = moves + 1
+        else:
+            x, y = rng.choice(unknown)
+            play_open(x, y)
+            moves = moves + 1
+    return field.won() == 1, moves, cascades
+
+
+def _new_stats(rows, cols, mines):
+    """Return empty statistics for a board configuration."""
+    return {'rows': rows, 'cols': cols, 'mines': mines, 'games': 0,
+            'wins': 0, 'win_moves': 0, 'cascades': {}}
+
+
+def _merge_stats(stats, other):
+    """Add the counts in other into stats."""
+    for key in ('games', 'wins', 'win_moves'):
+        stats[key] = stats[key] + other[key]
+    for bucket, count in other['cascades'].items():
+        stats['cascades'][bucket] = stats['cascades'].get(bucket, 0) + count
+
+
+def play_chunk(job):
+    """Play a chunk of games and return their statistics.
+
+    job is a 4-tuple: rows, cols, mines, and a sequence of seeds, one per
+    game.  Each game's field and guesses use random.Random(seed), so every
+    game can be replayed exactly.
+    """
+    rows, cols, mines, seeds = job
+    stats = _new_stats(rows, cols, mines)
+    for seed in seeds:
+        rng = random.Random(seed)
+        won, moves, cascades = auto_play(Field(rows, cols, mines, rng), rng)
+        stats['games'] = stats['games'] + 1
+        if won:
+            stats['wins'] = stats['wins'] + 1
+            stats['win_moves'] = stats['win_moves'] + moves
+        for size in cascades:
+            bucket = _bucket(size)
+            stats['cascades'][bucket] = stats['cascades'].get(bucket, 0) + 1
+    return stats
+
+
+def summarize(stats, done = 0):
+    """Return a JSON line describing the given statistics."""
+    games = stats['games']
+    wins = stats['wins']
+    summary = {'board': '%dx%d/%d' % (stats['cols'], stats['rows'],
+                                      stats['mines']),
+               'games': games, 'wins': wins,
+               'win_rate': games and float(wins) / games,
+               'mean_moves_to_win': wins and float(stats['win_moves']) / wins,
+               'cascade_histogram': stats['cascades'],
+               'done': bool(done)}
+    return json.dumps(summary, sort_keys = True)
+
+
+def parse_config(text):
+    """Parse a board configuration of the form COLSxROWS/MINES."""
+    size, mines = text.split('/')
+    cols, rows = size.split('x')
+    return int(rows), int(cols), int(mines)
+
+
+def main(argv = None):
+    parser = OptionParser(usage = 'usage: %prog [options] '
+                                  '[COLSxROWS/MINES ...]')
+    parser.add_option('-n', '--games', type = 'int', default = 10000,
+                      help = 'games to play per configuration')
+    parser.add_option('-s', '--seed', type = 'int', default = 0,
+                      help = 'seed of the first game; game i uses seed + i')
+    parser.add_option('-c', '--chunk', type = 'int', default = 500,
+                      help = 'games handed to a worker at a time')
+    parser.add_option('-p', '--processes', type = 'int', default = None,
+                      help = 'worker processes (default: one per CPU)')
+    options, args = parser.parse_args(argv)
+    if not args:
+        args = ['9x9/10', '16x16/40', '30x16/99']
+    try:
+        configs = [parse_config(arg) for arg in args]
+    except ValueError:
+        parser.error('configurations must look like COLSxROWS/MINES')
+
+    jobs = []
+    for rows, cols, mines in configs:
+        for start in range(0, options.games, options.chunk):
+            end = min(start + options.chunk, options.games)
+            seeds = range(options.seed + start, options.seed + end)
+            jobs.append((rows, cols, mines, seeds))
+
+    totals = {}
+    remaining = {}
+    for rows, cols, mines, seeds in jobs:
+        key = (rows, cols, mines)
+        totals[key] = _new_stats(rows, cols, mines)
+        remaining[key] = remaining.get(key, 0) + 1
+
+    pool = Pool(options.processes)
+    try:
+        for stats in pool.imap_unordered(play_chunk, jobs):
+            key = (stats['rows'], stats['cols'], stats['mines'])
+            _merge_stats(totals[key], stats)
+            remaining[key] = remaining[key] - 1
+            print summarize(totals[key], remaining[key] == 0)
+            sys.stdout.flush()
+    finally:
+        pool.close()
+        pool.join()
+
+
+if __name__ == '__main__':
+    main()
+
+# vim: ts=8 sts=4 sw=4 expandtab
@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation; either version 2 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA, 02111-1307.
+
+"""Time the hot paths of game.Field.
+
+Usage: python bench_game.py [options]
+
+Every benchmark runs on boards generated from fixed seeds, for each board
+size and mine density asked for, and keeps the best of several repeats.
+Results are written one JSON object per line, with the benchmark name,
+board size, density, and seconds per call.  Save them with --output and
+pass the file to --compare on a later run to list every benchmark that got
+slower by more than the threshold; the exit status is then 1 if any did.
+"""
+
+import random, sys
+from optparse import OptionParser
+from timeit import default_timer
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from game import Field
+
+default_sizes = '9x9,16x16,30x16,100x100,500x500,1000x1000,2000x2000'
+default_densities = '0.05,0.1,0.2,0.3'
+
+# Most per-tile benchmarks call the operation on a sample of this many tiles.
+sample_size = 10000
+
+
+def _best(repeat, setup, run):
+    """Return the best time of run() over repeat runs.
+
+    setup() is called before each run, untimed, and its result is passed to
+    run().
+    """
+    best = None
+    for count in range(repeat):
+        state = setup()
+        start = default_timer()
+        run(state)
+        elapsed = default_timer() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def _sample(field, rng, wanted):
+    """Return up to sample_size coordinates of tiles for which wanted(x, y)
+    is true, chosen with rng."""
+    tiles = [(x, y) for x in range(field.cols) for y in range(field.rows)
+             if wanted(x, y)]
+    if len(tiles) > sample_size:
+        tiles = rng.sample(tiles, sample_size)
+    return tiles
+
+
+def _cleared(backend, rows, cols, mines, seed):
+    """Return a field with every safe tile opened and every mine flagged."""
+    field = backend(rows, cols, mines, seed = seed)
+    for x in range(cols):
+        for y in range(rows):
+            if field.board[x][y][0] == -1:
+                field.flag(x, y)
+    field.open([(x, y) for x in range(cols) for y in range(rows)])
+    return field
+
+
+def bench_board(backend, rows, cols, density, seed, repeat):
+    """Run every benchmark on one board configuration.
+
+    The function returns a list of (name, seconds per call) 2-tuples.
+    """
+    mines = min(int(rows * cols * density), rows * cols - 1)
+    rng = random.Random(seed)
+    results = []
+
+    def new_field():
+        return backend(rows, cols, mines, seed = seed)
+
+    # Small boards are set up in microseconds, too little to time once, so
+    # enough fields for sample_size tiles are made back to back and the
+    # time is divided among them.
+    number = max(1, sample_size // (rows * cols))
+
+    def new_fields():
+        return [new_field() for count in xrange(number)]
+    results.append(('init', _best(repeat, lambda: None,
+                                  lambda state: new_fields()) / number))
+
+    # Find the tiles to open: numbered ones, and one in the largest empty
+    # region, whose cascade is the most expensive a click can cause.  Every
+    # backend places the same mines for a seed, so a plain Field will do.
+    probe = Field(rows, cols, mines, seed = seed)
+    values = probe.values
+    counts = probe.counts
+    numbered = _sample(probe, rng, lambda x, y: values[x * rows + y] != -1
+                                   and counts[x * rows + y] > 0)
+    biggest = None
+    probe._get_labels()
+    if probe.region_sizes:
+        sizes = probe.region_sizes
+        start = probe.region_starts[sizes.index(max(sizes))]
+        biggest = divmod(probe.region_tiles[start], rows)
+
+    # Likewise, the whole sample of numbered tiles is opened on each fresh
+    # field.
+    def open_single(field):
+        for x, y in numbered:
+            field.open(x, y)
+    if numbered:
+        results.append(('open_single', _best(repeat, new_field, open_single)
+                                       / len(numbered)))
+
+    def open_cascade(fields):
+        for field in fields:
+            field.open(*biggest)
+    if biggest is not None:
+        results.append(('open_cascade', _best(repeat, new_fields,
+                                              open_cascade) / number))
+
+    field = _cleared(backend, rows, cols, mines, seed)
+    tiles = _sample(field, rng, lambda x, y: 1)
+
+    def per_call(run):
+        return _best(repeat, lambda: field, run) / len(tiles)
+
+    # The neighbor table is computed rather than stored, so time looking up
+    # the neighbors of a tile instead of building it.
+    def neighbors(field):
+        table = field._get_neighbors()
+        for x, y in tiles:
+            table[x * rows + y]
+    results.append(('neighbors', per_call(neighbors)))
+
+    def open_adjacent(field):
+        for x, y in tiles:
+            field.open_adjacent(x, y)
+    results.append(('open_adjacent', per_call(open_adjacent)))
+
+    def read(field):
+        for x, y in tiles:
+            field.read(x, y)
+    results.append(('read', per_call(read)))
+
+    def get_adjacent_info(field):
+        for x, y in tiles:
+            field.get_adjacent_info(x, y)
+    results.append(('get_adjacent_info', per_call(get_adjacent_info)))
+
+    def won(field):
+        for x, y in tiles:
+            field.won()
+    results.append(('won', per_call(won)))
+
+    field = new_field()
+    tiles = _sample(field, rng, lambda x, y: 1)
+
+    def flag(field):
+        for x, y in tiles:
+            field.flag(x, y)
+            field.flag(x, y)
+    results.append(('flag', per_call(flag) / 2))
+    return results
+
+
+def parse_size(text):
+    """Parse a board size of the form COLSxROWS."""
+    cols, rows = text.split('x')
+    return int(rows), int(cols)
+
+
+def compare(results, baseline, threshold):
+    """Compare results against a baseline and report regressions.
+
+    results and baseline are lists of result dictionaries.  A result is
+    only compared with the baseline result for the same benchmark, backend,
+    board, and seed.  A line is written to standard error for every
+    benchmark slower than threshold times its baseline.  The function
+    returns the number of those.
+    """
+    def key(result):
+        return (result['bench'], result['cols'], result['rows'],
+                result['density'], result['backend'], result['seed'])
+    old = {}
+    for result in baseline:
+        old[key(result)] = result['seconds']
+    regressions = 0
+    compared = 0
+    for result in results:
+        before = old.get(key(result))
+        if not before:
+            continue
+        compared = compared + 1
+        ratio = result['seconds'] / before
+        if ratio > threshold:
+            regressions = regressions + 1
+            sys.stderr.write('REGRESSION %s %dx%d %.2f %s seed %d: '
+                             '%.3gs -> %.3gs (x%.2f)\n'
+                             % (key(result) + (before, result['seconds'],
+                                               ratio)))
+    if not compared:
+        sys.stderr.write('no baseline results for these benchmarks, '
+                         'backend, and seed\n')
+    return regressions
+
+
+def main(argv = None):
+    parser = OptionParser(usage = 'usage: %prog [options]')
+    parser.add_option('--sizes', default = default_sizes,
+                      help = 'comma separated COLSxROWS board sizes')
+    parser.add_option('--densities', default = default_densities,
+                      help = 'comma separated mine densities')
+    parser.add_option('-s', '--seed', type = 'int', default = 1,
+                      help = 'seed for every board')
+    parser.add_option('-r', '--repeat', type = 'int', default = 5,
+                      help = 'runs per benchmark; the best is kept')
+    parser.add_option('--numpy', action = 'store_true', default = False,
+                      help = 'benchmark numpy_game.NumpyField instead')
+    parser.add_option('-o', '--output', default = None,
+                      help = 'also save the results to this file')
+    parser.add_option('-c', '--compare', default = None,
+                      help = 'baseline results file to compare against')
+    parser.add_option('-t', '--threshold', type = 'float', default = 1.1,
+                      help = 'slowdown ratio counted as a regression')
+    options, args = parser.parse_args(argv)
+
+    backend = Field
+    if options.numpy:
+        from numpy_game import NumpyField
+        backend = NumpyField
+
+    output = None
+    if options.output:
+        output = open(options.output, 'w')
+    results = []
+    for size in options.sizes.split(','):
+        rows, cols = parse_size(size)
+        for density in options.densities.split(','):
+            density = float(density)
+            for name, seconds in bench_board(backend, rows, cols, density,
+                                             options.seed, options.repeat):
+                result = {'bench': name, 'backend': backend.__name__,
+                          'cols': cols, 'rows': rows, 'density': density,
+                          'seed': options.seed, 'seconds': seconds}
+                results.append(result)
+                line = json.dumps(result, sort_keys = True)
+                print line
+                sys.stdout.flush()
+                if output:
+                    output.write(line + '\n')
+                    output.flush()
+    if output:
+        output.close()
+
+    if options.compare:
+        baseline = [json.loads(line) for line in open(options.compare)
+                    if line.strip()]
+        if compare(results, baseline, options.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
+
+# vim: ts=8 sts=4 sw=4 expandtab
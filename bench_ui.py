@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation; either version 2 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA, 02111-1307.
+
+"""Time the drawing done by SDL_UI.
+
+Usage: python bench_ui.py [options]
+
+The SDL dummy video and audio drivers are used unless SDL_VIDEODRIVER or
+SDL_AUDIODRIVER say otherwise, so this runs on machines without a display
+or a sound card.  The display is asked for 32 bits per pixel, as a desktop
+would give, since the dummy driver would otherwise be palettized.  For each
+board size, the interface's _init_surfaces(), reset(), and _update_status()
+are timed, and then a seeded script of cursor moves, opens, and flags is
+replayed through a Session, calling update_game() once per frame as
+blindmine.run() does.  A second replay redraws the whole field every frame.
+Last, a seeded trace of mouse motion is mapped to tiles, both with
+SDL_UI._get_coords_list() and one position at a time with _get_coords().
+
+One JSON object is written per line for each board size and benchmark,
+with the number of frames, the 50th, 90th and 99th percentile and maximum
+frame times in seconds, and the mean number of blits per frame made
+through SDL_UI._draw(); reset() blits its whole surfaces directly, so those
+are not counted.
+"""
+
+import os, random, sys
+from optparse import OptionParser
+from timeit import default_timer
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from sdl_ui import SDL_UI
+from session import Session
+
+default_sizes = '9x9,16x16,30x16,60x40'
+
+
+def percentile(times, fraction):
+    """Return the nearest-rank percentile of a sorted list of times."""
+    rank = int(round(fraction * (len(times) - 1)))
+    return times[rank]
+
+
+def summarize(name, cols, rows, times, blits):
+    """Return a JSON line describing the frame times of one benchmark.
+
+    times is a list of frame times in seconds, and blits the number of
+    blits made in each of those frames.
+    """
+    times = times[:]
+    times.sort()
+    summary = {'bench': name, 'cols': cols, 'rows': rows,
+               'frames': len(times),
+               'p50': percentile(times, 0.5),
+               'p90': percentile(times, 0.9),
+               'p99': percentile(times, 0.99),
+               'max': times[-1],
+               'blits_per_frame': float(sum(blits)) / len(blits)}
+    return json.dumps(summary, sort_keys = True)
+
+
+class CountingUI:
+    """Count the blits an SDL_UI makes.
+
+    Every call to the interface's _draw() is one blit; this class replaces
+    _draw() on one SDL_UI instance with a wrapper that counts them.
+    """
+    def __init__(self, ui):
+        self.ui = ui
+        self.blits = 0
+        self.draw = ui._draw
+        ui._draw = self._draw
+
+    def _draw(self, surface, position):
+        self.blits = self.blits + 1
+        self.draw(surface, position)
+
+    def call(self, func, *args):
+        """Call func with args, and return the seconds it took and the
+        number of blits it made."""
+        self.blits = 0
+        start = default_timer()
+        func(*args)
+        return default_timer() - start, self.blits
+
+
+def script(rng, frames):
+    """Yield the actions of frames scripted frames.
+
+    Most frames move the cursor one tile, as if an arrow key was tapped;
+    the rest flag the tile under it or press space on it, which opens an
+    unknown tile and sweeps around an opened one.  Every frame's actions are a
+    list, as returned by SDL_UI.get_input().
+    """
+    directions = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+    for frame in xrange(frames):
+        choice = rng.random()
+        if choice < 0.7:
+            direction = rng.choice(directions)
+            yield [('direction_pressed', direction),
+                   ('direction_up', direction)]
+        elif choice < 0.9:
+            yield [('cursor_sweep', (-1, -1))]
+        else:
+            yield [('cursor_flag', (-1, -1))]
+
+
+def mouse_trace(rng, ui, length):
+    """Return a trace of length mouse positions wandering over the window.
+
+    The mouse moves a few pixels at a time, as motion events report it,
+    and may leave the playing field for the header, the statusbar, or the
+    margins.
+    """
+    width, height = ui.screen.get_size()
+    x = rng.randrange(width)
+    y = rng.randrange(height)
+    trace = []
+    for count in xrange(length):
+        x = min(max(x + rng.randint(-8, 8), 0), width - 1)
+        y = min(max(y + rng.randint(-8, 8), 0), height - 1)
+        trace.append((x, y))
+    return trace
+
+
+def replay(counter, session, rng, frames, full):
+    """Replay a script of frames through a session and draw every frame.
+
+    A new game is started, outside the timings, whenever one is over.  If
+    full is true, the whole field is redrawn every frame.  The function
+    returns the list of frame times and the list of blits per frame.
+    """
+    ui = counter.ui
+    times = []
+    blits = []
+    ui.reset(session.rows, session.cols, session.mines)
+    for actions in script(rng, frames):
+        session.step(actions)
+        changed = session.changed
+        field = session.field
+        if full:
+            changed = None
+        elapsed, count = counter.call(ui.update_game, field.board,
+                                      field.rows, field.cols, field.flags,
+                                      field.playtime(), field.won(),
+                                      session.cursor, changed)
+        times.append(elapsed)
+        blits.append(count)
+        if session.over:
+            session.new_game()
+            ui.reset(session.rows, session.cols, session.mines)
+    return times, blits
+
+
+def bench_size(counter, rows, cols, density, seed, frames, repeat):
+    """Run every benchmark on one board size and return their JSON lines."""
+    ui = counter.ui
+    mines = max(1, int(rows * cols * density))
+    lines = []
+
+    ui.reset(rows, cols, mines)
+    for name, func, args in (('init_surfaces', ui._init_surfaces, ()),
+                             ('reset', ui.reset, (rows, cols, mines))):
+        results = [counter.call(func, *args) for count in range(repeat)]
+        lines.append(summarize(name, cols, rows,
+                               [elapsed for elapsed, count in results],
+                               [count for elapsed, count in results]))
+
+    ui.reset(rows, cols, mines)
+    results = []
+    for count in range(repeat):
+        results.append(counter.call(ui._update_status, count,
+                                    '%02d:%02d' % divmod(count, 60)))
+    lines.append(summarize('update_status', cols, rows,
+                           [elapsed for elapsed, count in results],
+                           [count for elapsed, count in results]))
+
+    for name, full in (('update_game', 0), ('update_game_full', 1)):
+        rng = random.Random(seed)
+        session = Session(rows, cols, mines, rng)
+        times, blits = replay(counter, session, rng, frames, full)
+        lines.append(summarize(name, cols, rows, times, blits))
+
+    ui.reset(rows, cols, mines)
+    trace = mouse_trace(random.Random(seed), ui, frames * 20)
+    def get_coords_each(trace):
+        return [ui._get_coords(pos) for pos in trace]
+    for name, func in (('mouse_trace', ui._get_coords_list),
+                       ('mouse_trace_each', get_coords_each)):
+        results = [counter.call(func, trace) for count in range(repeat)]
+        lines.append(summarize(name, cols, rows,
+                               [elapsed for elapsed, count in results],
+                               [count for elapsed, count in results]))
+    return lines
+
+
+def parse_size(text):
+    """Parse a board size of the form COLSxROWS."""
+    cols, rows = text.split('x')
+    return int(rows), int(cols)
+
+
+def main(argv = None):
+    parser = OptionParser(usage = 'usage: %prog [options]')
+    parser.add_option('--sizes', default = default_sizes,
+                      help = 'comma separated COLSxROWS board sizes')
+    parser.add_option('-d', '--density', type = 'float', default = 0.15,
+                      help = 'mine density of the replayed games')
+    parser.add_option('-s', '--seed', type = 'int', default = 1,
+                      help = 'seed for the boards and the scripts')
+    parser.add_option('-f', '--frames', type = 'int', default = 500,
+                      help = 'frames replayed per board size')
+    parser.add_option('-r', '--repeat', type = 'int', default = 20,
+                      help = 'calls timed for the other benchmarks')
+    parser.add_option('--depth', type = 'int', default = 32,
+                      help = 'bits per pixel of the display, or 0 for '
+                             "SDL's choice")
+    options, args = parser.parse_args(argv)
+
+    # The interface loads its sounds and images relative to the game.
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sizes = [parse_size(size) for size in options.sizes.split(',')]
+    rows, cols = sizes[0]
+    SDL_UI.depth = options.depth
+    counter = CountingUI(SDL_UI(rows, cols, 1))
+    for rows, cols in sizes:
+        for line in bench_size(counter, rows, cols, options.density,
+                               options.seed, options.frames,
+                               options.repeat):
+            print line
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
+
+# vim: ts=8 sts=4 sw=4 expandtab
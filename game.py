@@ -1,4 +1,89 @@
 import random, time, math
+from array import array
+from hashlib import sha1
+
+
+class _NeighborTable:
+    """Provide the flat indices of the tiles adjacent to every tile.
+
+    table[index] is a tuple of the flat indices of the tiles adjacent to the
+    tile at flat index index, x * rows + y, in the same order as
+    Field._get_adjacent().  Nothing is stored per tile: away from the edges
+    of the field the neighbors are at eight fixed offsets from the tile, and
+    only tiles on an edge have theirs worked out one by one.
+    """
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        rows = self.rows
+        if not 0 <= index < self.size:
+            raise IndexError, "tile index out of range"
+        x, y = divmod(index, rows)
+        if 0 < y < rows - 1 and 0 < x < self.cols - 1:
+            return (index - rows - 1, index - 1, index + rows - 1,
+                    index - rows, index + rows,
+                    index - rows + 1, index + 1, index + rows + 1)
+        adjlist = []
+        for dy in (-1, 0, 1):
+            if 0 <= y + dy < rows:
+                for dx in (-1, 0, 1):
+                    if (dx or dy) and 0 <= x + dx < self.cols:
+                        adjlist.append(index + dx * rows + dy)
+        return tuple(adjlist)
+
+
+class _BoardColumn:
+    """Provide a read-only view of one column of a Field's board.
+
+    Indexing a column with a row number returns the (value, state) 2-tuple
+    that Field.board used to hold for that tile.
+    """
+    def __init__(self, field, x):
+        self.field = field
+        self.x = x
+
+    def __len__(self):
+        return self.field.rows
+
+    def __getitem__(self, y):
+        rows = self.field.rows
+        if y < 0:
+            y = y + rows
+        if not 0 <= y < rows:
+            raise IndexError, "board row out of range"
+        index = self.x * rows + y
+        return (self.field.values[index], self.field.states[index])
+
+
+class _BoardView:
+    """Provide a read-only view of a Field's board.
+
+    board[x][y] returns the (value, state) 2-tuple for the tile at (x, y),
+    just like the old list-of-columns representation did.  value is -2 for
+    an unopened safe tile, -1 for a mine, or the number of adjacent mines
+    once the tile is opened; state is 0 for unknown, 1 for flagged, and -1
+    for opened.
+    """
+    def __init__(self, field):
+        self.field = field
+
+    def __len__(self):
+        return self.field.cols
+
+    def __getitem__(self, x):
+        cols = self.field.cols
+        if x < 0:
+            x = x + cols
+        if not 0 <= x < cols:
+            raise IndexError, "board column out of range"
+        return _BoardColumn(self.field, x)
+
 
 class Field:
     """Provide a playing field for a Minesweeper game.
@@ -6,7 +91,8 @@ class Field:
     This class internally represents a Minesweeper playing field, and provides
     all functions necessary for the basic manipulations used in the game.
     """
-    def __init__(self, rows = 16, cols = 16, mines = 40):
+    def __init__(self, rows = 16, cols = 16, mines = 40, rng = None,
+                 seed = None):
         """Initialize the playing field.
 
         This function creates a playing field of the given size, and randomly
@@ -14,7 +100,17 @@ class Field:
 
         rows and cols are the numbers of rows and columns of the playing
         field, respectively.  mines is the number of mines to be placed within
-        the field.
+        the field.  rng is the random.Random instance used to place mines,
+        including the relocation of a mine hit by the first click.  If it is
+        not given, random.Random(seed) is used when a seed is given, and the
+        random module itself otherwise.  The same seed or the same rng state
+        always produces the same board.
+
+        The tiles are stored in two flat arrays of signed bytes, values and
+        states, indexed by x * rows + y.  board is a read-only view over them
+        which keeps the board[x][y] == (value, state) interface.  counts
+        holds the number of mines adjacent to every tile, computed once the
+        mines are placed, so opening a tile is a single lookup.
         """
         for var in (rows, cols, mines):
             if var < 0:
@@ -29,26 +125,46 @@ class Field:
         self.flags = 0
         self.start_time = None
         self.lose = 0
+        if rng is None:
+            if seed is None:
+                rng = random
+            else:
+                rng = random.Random(seed)
+        self.rng = rng
+        self.seed = seed
+
+        # One extra tile is drawn along with the mines; it is guaranteed to
+        # be free, and is where a mine hit by the first click is moved to.
+        minelist = rng.sample(xrange(rows * cols), mines + 1)
+        self.spare = minelist.pop()
 
-        minelist = []
-        self.freecoords = {}
-        for col in range(cols):
-            self.freecoords[col] = range(rows)
-        while mines > 0:
-            y = random.choice(self.freecoords.keys())
-            x = random.randrange(len(self.freecoords[y]))
-            minelist.append((self.freecoords[y][x], y))
-            del self.freecoords[y][x]
-            if not self.freecoords[y]:
-                del self.freecoords[y]
-            mines = mines - 1
-
-        self.board = []
-        for col in range(cols):
-            self.board.append([(-2, 0)] * rows)
-            for row in range(rows):
-                if (row, col) in minelist:
-                    self.board[col][row] = (-1, 0)
+        self.board = _BoardView(self)
+        self.neighbors = None
+        self.labels = None
+        self.region_tiles = None
+        self.region_starts = None
+        self.region_sizes = None
+        self._init_board(minelist)
+
+
+    def _init_board(self, minelist):
+        """Create the tile arrays and place the given mines.
+
+        This function creates the values, states, and counts arrays, with
+        mines at the flat indices in minelist.
+        """
+        size = self.rows * self.cols
+        self.values = array('b', [-2]) * size
+        self.states = array('b', [0]) * size
+
+        values = self.values
+        neighbors = self._get_neighbors()
+        counts = array('b', [0]) * size
+        for index in minelist:
+            values[index] = -1
+            for adjindex in neighbors[index]:
+                counts[adjindex] = counts[adjindex] + 1
+        self.counts = counts
 
 
     def _get_adjacent(self, x, y):
@@ -59,19 +175,39 @@ class Field:
 
         x and y are the x and y coordinates of the base tile, respectively.
         """
-        adjlist = [(x - 1, y - 1), (x, y - 1), (x + 1, y - 1),
-                   (x - 1, y), (x + 1, y),
-                   (x - 1, y + 1), (x, y + 1), (x + 1, y + 1)]
-        rmlist = []
-        for adjpair in adjlist:
-            for value, index in [(-1, 0), (-1, 1), (self.cols, 0),
-                                 (self.rows, 1)]:
-                if adjpair[index] == value:
-                    rmlist.append(adjpair)
-                    break
-        for item in rmlist:
-            adjlist.remove(item)
-        return adjlist
+        rows = self.rows
+        return [divmod(index, rows)
+                for index in self._get_neighbors()[x * rows + y]]
+
+
+    def _get_neighbors(self):
+        """Provide the neighbor table for this field.
+
+        This function returns a _NeighborTable for the field's size,
+        creating it the first time it is needed.
+        """
+        if self.neighbors is None:
+            self.neighbors = _NeighborTable(self.rows, self.cols)
+        return self.neighbors
+
+
+    def _move_mine(self, index, newindex):
+        """Move a mine from one tile to another.
+
+        This function relocates the mine at flat index index to the free
+        tile at newindex, keeping the adjacency counts up to date and
+        discarding any region labels.
+        """
+        values = self.values
+        counts = self.counts
+        neighbors = self._get_neighbors()
+        values[index] = -2
+        for adjindex in neighbors[index]:
+            counts[adjindex] = counts[adjindex] - 1
+        values[newindex] = -1
+        for adjindex in neighbors[newindex]:
+            counts[adjindex] = counts[adjindex] + 1
+        self.labels = None
 
 
     def open(self, coordlist, y = None):
@@ -91,42 +227,193 @@ class Field:
         opened; otherwise, the function will open the tiles whose
         coordinates are given in 2-tuples in coordlist.
         """
+        return list(self.iter_open(coordlist, y))
+
+
+    def iter_open(self, coordlist, y = None):
+        """Open one or more tiles, yielding results as they are opened.
+
+        This function takes the same arguments as Field.open(), and yields
+        the same 2-tuples that Field.open() would return, one at a time as
+        each tile is opened.  This lets a caller react to the first result
+        before a large cascade has finished.  Tiles are only opened as the
+        iterator is advanced; if the caller stops early, the rest of the
+        cascade is left unopened.
+        """
+        rows = self.rows
         if y is not None:
-            coordlist = [(coordlist, y)]
-        opened = []
-        while len(coordlist) != 0:
-            x, y = coordlist.pop()
-            not_done = 1
-            if (self.board[x][y][1] == 1) or (self.board[x][y][0] >= 0):
-                not_done = 0
-            elif self.board[x][y][0] == -1:
+            return self._iter_open_indices([coordlist * rows + y])
+        return self._iter_open_indices([x * rows + y for x, y in coordlist])
+
+
+    def _iter_open_indices(self, stack):
+        """Open the tiles at the given flat indices, yielding the results.
+
+        This function does the work of Field.iter_open(), taking a list of
+        flat tile indices rather than coordinates.  The list is consumed,
+        last entry first.
+
+        When a tile with no adjacent mines is opened, the empty region around
+        it is opened by _iter_region().  Tiles are yielded in the order they
+        are opened, which depends only on the board and the tiles asked for.
+        """
+        rows = self.rows
+        values = self.values
+        states = self.states
+        counts = self.counts
+        while len(stack) != 0:
+            index = stack.pop()
+            if (states[index] == 1) or (values[index] >= 0):
+                continue
+            elif values[index] == -1:
                 if self.cleared > 0:
-                    self.board[x][y] = (-1, -1)
-                    opened.append(((x, y), -1))
-                    not_done = 0
-                else:
-                    while self.board[x][y][0] == -1:
-                        # The first opened block is a mine; move it elsewhere.
-                        newx = random.choice(self.freecoords.keys())
-                        newy = random.randrange(len(self.freecoords[newx]))
-                        self.board[x][y] = (-2, 0)
-                        self.board[newx][newy] = (-1,
-                                                  self.board[newx][newy][1])
-            if not_done:
-                adjlist = self._get_adjacent(x, y)
-                adjcount = 0
-                for adjx, adjy in adjlist:
-                    if self.board[adjx][adjy][0] == -1:
-                        adjcount = adjcount + 1
-                self.board[x][y] = (adjcount, -1)
-                if self.cleared is 0:
-                    del self.freecoords
-                    self.start_time = time.time()
+                    states[index] = -1
+                    yield (divmod(index, rows), -1)
+                    continue
+                # The first opened block is a mine; move it elsewhere.
+                self._move_mine(index, self.spare)
+            if self.cleared is 0:
+                self.spare = None
+                self.start_time = time.time()
+            adjcount = counts[index]
+            values[index] = adjcount
+            states[index] = -1
+            self.cleared = self.cleared + 1
+            yield (divmod(index, rows), adjcount)
+            if adjcount == 0:
+                for result in self._iter_region(index):
+                    yield result
+
+
+    def _label_region(self, index):
+        """Provide the number of the empty region holding the given tile.
+
+        This function returns the number of the connected empty region
+        containing the safe tile at flat index index, which must have no
+        adjacent mines.  Regions are labelled one at a time, the first time
+        one is opened, so a click never pays for the rest of the board.
+
+        The labelled regions share flat arrays: self.region_tiles holds
+        every region's tiles followed by its numbered border, region n
+        taking the entries from self.region_starts[n] up to
+        self.region_starts[n + 1], of which the first self.region_sizes[n]
+        are the empty tiles.  self.labels holds the region number of every
+        labelled empty tile, and -1 for every other tile.  The labels depend
+        only on where the mines are, and are discarded when a mine is moved.
+        """
+        labels = self.labels
+        if labels is None:
+            labels = array('i', [-1]) * (self.rows * self.cols)
+            self.labels = labels
+            self.region_tiles = array('i')
+            self.region_starts = array('i', [0])
+            self.region_sizes = array('i')
+        label = labels[index]
+        if label != -1:
+            return label
+        counts = self.counts
+        neighbors = self._get_neighbors()
+        tiles = self.region_tiles
+        label = len(self.region_sizes)
+        start = len(tiles)
+        labels[index] = label
+        tiles.append(index)
+
+        # None of the tiles around an empty one can be mines, so each is
+        # either another empty tile of the region or on its border.
+        border = []
+        bordered = set()
+        position = start
+        while position < len(tiles):
+            for adjindex in neighbors[tiles[position]]:
+                if counts[adjindex] == 0:
+                    if labels[adjindex] == -1:
+                        labels[adjindex] = label
+                        tiles.append(adjindex)
+                elif adjindex not in bordered:
+                    bordered.add(adjindex)
+                    border.append(adjindex)
+            position = position + 1
+        self.region_sizes.append(len(tiles) - start)
+        tiles.extend(border)
+        self.region_starts.append(len(tiles))
+        return label
+
+
+    def _get_labels(self):
+        """Label every empty region of the field.
+
+        This function labels the regions _label_region() has not reached
+        yet, and returns self.labels.  Opening tiles never needs this; it is
+        for callers which look at all the regions at once.
+        """
+        values = self.values
+        counts = self.counts
+        for index in xrange(self.rows * self.cols):
+            if counts[index] == 0 and values[index] != -1:
+                self._label_region(index)
+        return self.labels
+
+
+    def _iter_region(self, index):
+        """Open the empty region around a just opened empty tile.
+
+        This function opens every unknown tile reachable from the tile at
+        flat index index through other empty tiles, yielding the results.
+        The region and its border are looked up from _label_region(), so
+        nothing has to be searched twice.  If any other tile of the region
+        is already open or flagged, the region is walked instead, so that
+        flags keep blocking the cascade.
+        """
+        rows = self.rows
+        values = self.values
+        states = self.states
+        counts = self.counts
+        label = self._label_region(index)
+        tiles = self.region_tiles
+        start = self.region_starts[label]
+        for position in xrange(start, start + self.region_sizes[label]):
+            adjindex = tiles[position]
+            if states[adjindex] != 0 and adjindex != index:
+                for result in self._walk_region(index):
+                    yield result
+                return
+        for position in xrange(start, self.region_starts[label + 1]):
+            adjindex = tiles[position]
+            if states[adjindex] == 0:
+                adjcount = counts[adjindex]
+                values[adjindex] = adjcount
+                states[adjindex] = -1
                 self.cleared = self.cleared + 1
-                opened.append(((x, y), adjcount))
-                if adjcount == 0:
-                    coordlist.extend(adjlist)
-        return opened
+                yield (divmod(adjindex, rows), adjcount)
+
+
+    def _walk_region(self, index):
+        """Open the empty region around a just opened empty tile by walking it.
+
+        This function does the work of _iter_region() one tile at a time.
+        Every tile is opened at the moment it is reached, so the state array
+        doubles as the visited set and no tile is queued more than once.
+        """
+        rows = self.rows
+        values = self.values
+        states = self.states
+        counts = self.counts
+        neighbors = self._get_neighbors()
+
+        # None of the tiles around an empty one can be mines, so every
+        # unknown neighbor is opened as soon as it is found.
+        region = [index]
+        while len(region) != 0:
+            for adjindex in neighbors[region.pop()]:
+                if states[adjindex] == 0:
+                    adjcount = counts[adjindex]
+                    values[adjindex] = adjcount
+                    states[adjindex] = -1
+                    self.cleared = self.cleared + 1
+                    yield (divmod(adjindex, rows), adjcount)
+                    if adjcount == 0:
+                        region.append(adjindex)
 
 
     def open_adjacent(self, x, y):
@@ -140,16 +427,18 @@ class Field:
         x and y are the x and y coordinates of the tile to be flagged,
         respectively.
         """
-        adjmines = self.board[x][y][0]
-        if self.board[x][y][1] != -1:
+        rows = self.rows
+        states = self.states
+        adjmines = self.values[x * rows + y]
+        if states[x * rows + y] != -1:
             return []
-        adjlist = self._get_adjacent(x, y)
+        adjlist = self._get_neighbors()[x * rows + y]
         flagcount = 0
-        for adjx, adjy in adjlist:
-            if self.board[adjx][adjy][1] == 1:
+        for adjindex in adjlist:
+            if states[adjindex] == 1:
                 flagcount = flagcount + 1
         if adjmines == flagcount:
-            return self.open(adjlist)
+            return list(self._iter_open_indices(list(adjlist)))
         else:
             return []
         
@@ -166,14 +455,15 @@ class Field:
         x and y are the x and y coordinates of the tile to be flagged,
         respectively.
         """
-        if self.board[x][y][1] == -1:
+        index = x * self.rows + y
+        if self.states[index] == -1:
             return -1
-        elif self.board[x][y][1] == 0:
-            self.board[x][y] = (self.board[x][y][0], 1)
+        elif self.states[index] == 0:
+            self.states[index] = 1
             self.flags = self.flags + 1
             return 1
         else:
-            self.board[x][y] = (self.board[x][y][0], 0)
+            self.states[index] = 0
             self.flags = self.flags - 1
             return 0
 
@@ -182,20 +472,23 @@ class Field:
 
         if x < 0 or x >= self.cols or y < 0 or y >= self.rows:
             return "out"
-        elif self.board[x][y][1] == 1: # mine
+        index = x * self.rows + y
+        if self.states[index] == 1: # mine
             return "flagged"
-        elif self.board[x][y][1] == 0: # unknown
+        elif self.states[index] == 0: # unknown
             return "unknown"
         else:
-            return "%d" % self.board[x][y][0]
+            return "%d" % self.values[index]
 
     def get_adjacent_info(self, x, y):
         n_unveiled = 0; n_unknown = 0; n_flagged = 0
-        adjlist = self._get_adjacent(x, y)
-        for adjx, adjy in adjlist:
-            if self.board[adjx][adjy][1] == 1: # mine
+        rows = self.rows
+        states = self.states
+        for adjindex in self._get_neighbors()[x * rows + y]:
+            state = states[adjindex]
+            if state == 1: # mine
                 n_flagged = n_flagged + 1
-            elif self.board[adjx][adjy][1] == 0: # unknown
+            elif state == 0: # unknown
                 n_unknown = n_unknown + 1
             else:
                 n_unveiled = n_unveiled + 1
@@ -233,6 +526,21 @@ class Field:
 	    return 0
         return int(time.time() - self.start_time)
 
+    def fingerprint(self):
+        """Return a short string identifying the current mine layout.
+
+        The string holds the field's size and mine count, followed by the
+        first twelve hex digits of a SHA-1 digest of the mine positions, as
+        in '9x9/10-3f2a9c0b1d4e'.  Two fields with the same fingerprint have
+        the same mines.  Since the first click may move a mine, take the
+        fingerprint before the first open() to identify the generated board.
+        """
+        mines = [index for index in xrange(self.rows * self.cols)
+                 if self.values[index] == -1]
+        digest = sha1('%d %d %s' % (self.rows, self.cols,
+                                    ','.join(map(str, mines)))).hexdigest()
+        return '%dx%d/%d-%s' % (self.cols, self.rows, self.mines, digest[:12])
+
     def won(self):
         """Indicate whether or not the game has been won.
 
@@ -0,0 +1,181 @@
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation; either version 2 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA, 02111-1307.
+
+"""A NumPy backed playing field for offline analysis.
+
+This module requires NumPy, which the game itself does not; import it only
+where NumPy is known to be available.
+"""
+
+import numpy
+
+from game import Field
+
+
+def _shifts(grid):
+    """Yield the nine 3x3-window shifts of a zero-padded 2D array.
+
+    Each shift has the shape of grid; the one for offset (1, 1) is grid
+    itself, and is yielded last.
+    """
+    cols, rows = grid.shape
+    padded = numpy.pad(grid, 1, 'constant')
+    for dx in (0, 1, 2):
+        for dy in (0, 1, 2):
+            if (dx, dy) != (1, 1):
+                yield padded[dx:dx + cols, dy:dy + rows]
+    yield grid
+
+
+def _count_adjacent(grid):
+    """Return, for every tile of a 2D mine grid, its number of adjacent
+    mines, as the sum of the eight shifted copies of the padded grid."""
+    counts = numpy.zeros(grid.shape, numpy.int8)
+    shifts = list(_shifts(grid))
+    for shifted in shifts[:-1]:
+        counts += shifted
+    return counts
+
+
+def _dilate(grid):
+    """Return a 2D boolean grid grown by one tile in all eight directions."""
+    dilated = numpy.zeros(grid.shape, bool)
+    for shifted in _shifts(grid):
+        dilated |= shifted
+    return dilated
+
+
+class NumpyField(Field):
+    """Provide a playing field backed by NumPy arrays.
+
+    This class behaves like game.Field, but keeps values, states, and counts
+    in flat NumPy int8 arrays, computes the adjacency counts with shifted
+    slice sums, and opens empty regions with precomputed region labels.
+    When an empty tile is opened, its whole region and the region's border
+    are opened at once by one label lookup and one dilation; unlike
+    Field.iter_open(), stopping the iterator early does not leave part of
+    the region closed.
+    """
+    def _init_board(self, minelist):
+        """Create the tile arrays and place the given mines.
+
+        This function creates the values, states, and counts arrays, with
+        mines at the flat indices in minelist.
+        """
+        size = self.rows * self.cols
+        mines = numpy.zeros(size, numpy.int8)
+        mines[numpy.array(minelist, int)] = 1
+        self.values = numpy.where(mines, -1, -2).astype(numpy.int8)
+        self.states = numpy.zeros(size, numpy.int8)
+        self.counts = _count_adjacent(mines.reshape(self.cols,
+                                                    self.rows)).ravel()
+
+
+    def _adjust_counts(self, index, delta):
+        """Add delta to the counts of the tiles around a flat index."""
+        x, y = divmod(index, self.rows)
+        grid = self.counts.reshape(self.cols, self.rows)
+        grid[max(x - 1, 0):x + 2, max(y - 1, 0):y + 2] += delta
+        self.counts[index] -= delta
+
+
+    def _move_mine(self, index, newindex):
+        """Move a mine from one tile to another.
+
+        This function relocates the mine at flat index index to the free
+        tile at newindex, keeping the adjacency counts up to date and
+        discarding the region labels.
+        """
+        self.values[index] = -2
+        self._adjust_counts(index, -1)
+        self.values[newindex] = -1
+        self._adjust_counts(newindex, 1)
+        self.labels = None
+
+
+    def _get_labels(self):
+        """Provide the empty-region label of every tile.
+
+        This function returns a flat array holding, for every safe tile with
+        no adjacent mines, the smallest flat index in its connected empty
+        region, and -1 for every other tile.  The labels are computed on
+        first use with a vectorized union-find over adjacent empty tiles.
+        """
+        if self.labels is not None:
+            return self.labels
+        cols = self.cols
+        rows = self.rows
+        size = rows * cols
+        empty = (self.counts == 0) & (self.values != -1)
+        grid = empty.reshape(cols, rows)
+        indices = numpy.arange(size).reshape(cols, rows)
+        firsts = []
+        seconds = []
+        for first, second in (((slice(None, -1), slice(None)),
+                               (slice(1, None), slice(None))),
+                              ((slice(None), slice(None, -1)),
+                               (slice(None), slice(1, None))),
+                              ((slice(None, -1), slice(None, -1)),
+                               (slice(1, None), slice(1, None))),
+                              ((slice(None, -1), slice(1, None)),
+                               (slice(1, None), slice(None, -1)))):
+            both = grid[first] & grid[second]
+            firsts.append(indices[first][both])
+            seconds.append(indices[second][both])
+        firsts = numpy.concatenate(firsts)
+        seconds = numpy.concatenate(seconds)
+
+        parent = numpy.arange(size)
+        while 1:
+            first_roots = parent[firsts]
+            second_roots = parent[seconds]
+            differ = first_roots != second_roots
+            if not differ.any():
+                break
+            low = numpy.minimum(first_roots, second_roots)[differ]
+            high = numpy.maximum(first_roots, second_roots)[differ]
+            numpy.minimum.at(parent, high, low)
+            while 1:
+                jumped = parent[parent]
+                if (jumped == parent).all():
+                    break
+                parent = jumped
+        self.labels = numpy.where(empty, parent, -1)
+        return self.labels
+
+
+    def _iter_region(self, index):
+        """Open the empty region around a just opened empty tile.
+
+        This function opens the region containing the tile at flat index
+        index, and its border, in one step, and returns an iterator over the
+        results.  If any other tile of the region is already open or
+        flagged, the region is walked tile by tile as Field does, so that
+        flags keep blocking the cascade.
+        """
+        labels = self._get_labels()
+        states = self.states
+        region = labels == labels[index]
+        if numpy.count_nonzero(states[region]) != 1:
+            return self._walk_region(index)
+        border = _dilate(region.reshape(self.cols, self.rows)).ravel()
+        opening = numpy.flatnonzero(border & (states == 0))
+        counts = self.counts[opening]
+        self.values[opening] = counts
+        states[opening] = -1
+        self.cleared = self.cleared + len(opening)
+        xs, ys = divmod(opening, self.rows)
+        return iter(zip(zip(xs.tolist(), ys.tolist()), counts.tolist()))
+
+# vim: ts=8 sts=4 sw=4 expandtab
@@ -24,10 +24,14 @@ if not pygame.font:
 if not pygame.image:
     raise 'UIError', "The SDL UI requires pygame.image"
 
+import itertools
 import math
 import os.path
 import os
-import time
+try:
+    import threading
+except ImportError:
+    threading = None
 
 colors = {1: (223, 223, 255), 2: (223, 255, 223),
           3: (255, 223, 223), 4: (255, 255, 255),
@@ -37,6 +41,10 @@ colors = {1: (223, 223, 255), 2: (223, 255, 223),
 examine_keys = [ K_q, K_w, K_e, K_a, K_s, K_d, K_z, K_x, K_c ]
 direction_keys = [ K_UP, K_DOWN, K_LEFT, K_RIGHT ]
 
+# Posted once a second so that the statusbar clock keeps running while the
+# game is otherwise idle.
+CLOCKEVENT = USEREVENT+2
+
 direction_data = { K_UP: (0, -1), K_DOWN: (0, 1), K_LEFT: (-1,0), K_RIGHT:(1, 0) }
 
 examine_data = {K_q: ( -1, -1 ),
@@ -49,20 +57,120 @@ examine_data = {K_q: ( -1, -1 ),
                 K_x: (  0,  1 ),
                 K_c: ( +1,  1 ) }
 
+# Sounds which SDL_UI.feedback() plays, by feedback string, in the order
+# they are loaded.  The end-of-game sounds in rare_sounds are loaded last.
+sound_files = [("0", "data/0.wav"),
+               ("1", "data/1.wav"),
+               ("2", "data/2.wav"),
+               ("3", "data/3.wav"),
+               ("4", "data/4.wav"),
+               ("5", "data/5.wav"),
+               ("6", "data/6.wav"),
+               ("7", "data/7.wav"),
+               ("8", "data/8.wav"),
+               ("open", "data/open.wav"),
+               ("openmany", "data/openmany.wav"),
+               ("sweep", "data/sweep.wav"),
+               ("flagged", "data/flagged.wav"),
+               ("unflagged", "data/unflagged.wav"),
+               ("unknown", "data/unknown.wav"),
+               ("out", "data/out.wav"),
+               ("invalid", "data/invalid.wav"),
+               ("-1", "data/mine.wav"),
+               ("won", "data/won.wav"),
+               ("bad", "data/bad.wav")]
+rare_sounds = ("-1", "won", "bad")
+
+# Clips which SDL_UI.feedback() strings together into spoken phrases.
+speech_clips = (["data/n%d.wav" % num for num in range(17)] +
+                ["data/%d.wav" % num for num in range(10)] +
+                ["data/10.wav", "data/100.wav", "data/1000.wav",
+                 "data/comma.wav", "data/current_position.wav",
+                 "data/elapsed_time.wav", "data/second.wav",
+                 "data/number_of_mines.wav", "data/number_of_flag.wav",
+                 "data/toolongtime.wav"])
+
+class _NoLock:#{{{
+    """Stand in for threading.Lock when there is no thread to guard against."""
+    def acquire(self):
+        pass
+    def release(self):
+        pass
+#}}}
+
 class MusicQueue:#{{{
-    def __init__(self):
+    """Play a sequence of speech clips back to back.
+
+    Clips are decoded into Sound objects the first time they are needed, if
+    SDL_UI's background loader has not done so already.  They are played on
+    a reserved mixer channel, keeping the next clip queued on the channel so
+    that there is no gap between words.  The channel posts USEREVENT+1
+    whenever a clip ends, and SDL_UI.get_input() answers it by calling
+    play() to queue the following clip.
+
+    Whole phrases can also be queued with append_phrase(), which joins the
+    samples of their clips into a single Sound.  The most recently used
+    phrases are kept, up to phrase_cache_size of them, so repeating an
+    announcement costs nothing after the first time.
+
+    lock is held while a clip is decoded, so that the loader and the main
+    thread never decode the same clip twice, or two clips at once.
+    """
+    phrase_cache_size = 64
+
+    def __init__(self, lock = None):
+        if lock is None:
+            lock = _NoLock()
+        self.lock = lock
         self.queue = []
-        pygame.mixer.music.set_endevent(USEREVENT+1)
+        self.clips = {}
+        self.phrases = {}
+        self.phrase_order = []
+        pygame.mixer.set_reserved(1)
+        self.channel = pygame.mixer.Channel(0)
+        self.channel.set_endevent(USEREVENT+1)
     def empty(self):
         self.queue = []
     def append(self, str):
-        self.queue.append(str)
+        self.queue.append((str, self._get_clip(str)))
+    def append_phrase(self, phrase, filenames):
+        self.queue.append((phrase, self._get_phrase(phrase, filenames)))
+    def _get_clip(self, filename):
+        clip = self.clips.get(filename)
+        if clip is None:
+            self.lock.acquire()
+            try:
+                if not self.clips.has_key(filename):
+                    self.clips[filename] = pygame.mixer.Sound(filename)
+                clip = self.clips[filename]
+            finally:
+                self.lock.release()
+        return clip
+    def _get_phrase(self, phrase, filenames):
+        """Provide a single Sound speaking the given clips in order.
+
+        The clips are already in the mixer's sample format once loaded, so
+        their raw buffers can simply be concatenated.  phrase is the key the
+        result is cached under.
+        """
+        if self.phrases.has_key(phrase):
+            self.phrase_order.remove(phrase)
+        else:
+            raw = [self._get_clip(filename).get_raw()
+                   for filename in filenames]
+            self.phrases[phrase] = pygame.mixer.Sound(buffer = ''.join(raw))
+            if len(self.phrase_order) >= self.phrase_cache_size:
+                del self.phrases[self.phrase_order.pop(0)]
+        self.phrase_order.append(phrase)
+        return self.phrases[phrase]
     def play(self):
-        if self.queue:
-            print "["+self.queue[0]+"]"
-            pygame.mixer.music.load(self.queue[0])
-            self.queue.pop(0)
-            pygame.mixer.music.play()
+        while self.queue and self.channel.get_queue() is None:
+            name, clip = self.queue.pop(0)
+            print "["+name+"]"
+            if self.channel.get_busy():
+                self.channel.queue(clip)
+            else:
+                self.channel.play(clip)
 #}}}
 
 class SDL_UI:
@@ -71,21 +179,37 @@ class SDL_UI:
     This class is meant to serve as an interface class for Pysweeper.  It
     provides all necessary functions, and provides a number of pretty extras
     itself.
+
+    Boards with more columns or rows than max_view_cols and max_view_rows,
+    or than fit on the display, are shown through a view of that many tiles
+    which scrolls to follow the cursor.
+
+    depth is the bits per pixel asked of the display; 0 lets SDL choose.
     """
+    max_view_cols = 50
+    max_view_rows = 50
+    depth = 0
+
     def __init__(self, rows, cols, mines, tilesize = 20, paths = ('.',)):#{{{
         """Initialize all variables and visual elements needed for the game.
 
         This function creates everything needed to begin playing the game:
-        variables, fonts, surfaces, and other such core pieces.
+        variables, fonts, surfaces, and other such core pieces.  The window
+        is set up first; sounds are then decoded by a background thread, or
+        on first use, so the game can start before they are all ready.
         """
         self._init_vars(rows, cols, mines, tilesize, paths)
+        # Events caught by wait() are kept across reset(), so a key pressed
+        # while a game ends still reaches the next one.
+        self.waited = []
 
         if sys.platform == 'win32':
             os.environ["SDL_VIDEO_WINDOW_POS"] = "0,32"
         pygame.mixer.pre_init(22050, 16, 1, 1024 )
         pygame.init()
+        info = pygame.display.Info()
+        self.display_size = (info.current_w, info.current_h)
         #pygame.mixer.quit()
-        self._init_sounds()
         self._init_fonts()
         self._init_images()
         self._init_window()
@@ -94,8 +218,8 @@ class SDL_UI:
         self._init_screen()
         self._init_bg()
         self._init_surfaces()
-        self.flag_img.convert()
-        self.mine_img.convert()
+        self._init_sounds()
+        pygame.time.set_timer(CLOCKEVENT, 1000)
 #}}}
 
     def _init_vars(self, rows, cols, mines, tilesize, paths):#{{{
@@ -116,8 +240,8 @@ class SDL_UI:
         self.imagepaths = paths
         self.active = 1
         self.opened = []
-        self.pressed = []
-        self.pressed_last = []
+        self.pressed = set()
+        self.pressed_last = set()
         self.openmine = None
         self.last_button = None
         self.last_object = None
@@ -125,41 +249,92 @@ class SDL_UI:
         self.last_time = None
         self.newdraws = []
         self.opening_played = 0
-        self.prev_cursor = []
+        self.prev_cursor = ()
+        self.view_x = 0
+        self.view_y = 0
+        self.last_won = None
 #}}}
 
     def _init_sounds(self):#{{{
+        """Start the opening narration and the loading of sounds.
+
+        This function streams opening.ogg rather than decoding it, and
+        starts a thread which decodes every other sound: those in
+        sound_files, most used first, then the speech clips, then the rare
+        sounds.  Any sound needed before the thread gets to it is decoded
+        then and there by _get_sound() or MusicQueue.  Decoding is done
+        under MusicQueue's lock, so a sound the thread is decoding is waited
+        for rather than decoded again.
+        """
         # FIXME: please check this
         #if None == pygame.mixer.get_init():
         #    pass
-        self.sounds = { 
-            "-1": pygame.mixer.Sound("data/mine.wav"),
-            "0" : pygame.mixer.Sound("data/0.wav"),
-            "1" : pygame.mixer.Sound("data/1.wav"),
-            "2" : pygame.mixer.Sound("data/2.wav"),
-            "3" : pygame.mixer.Sound("data/3.wav"),
-            "4" : pygame.mixer.Sound("data/4.wav"),
-            "5" : pygame.mixer.Sound("data/5.wav"),
-            "6" : pygame.mixer.Sound("data/6.wav"),
-            "7" : pygame.mixer.Sound("data/7.wav"),
-            "8" : pygame.mixer.Sound("data/8.wav"),
-            "unknown" : pygame.mixer.Sound("data/unknown.wav"),
-            "out" : pygame.mixer.Sound("data/out.wav"),
-            "flagged" : pygame.mixer.Sound("data/flagged.wav"),
-            "open" : pygame.mixer.Sound("data/open.wav"),
-            "sweep": pygame.mixer.Sound("data/sweep.wav"),
-            "openmany" : pygame.mixer.Sound("data/openmany.wav"),
-            "unflagged" : pygame.mixer.Sound("data/unflagged.wav"),
-            "invalid": pygame.mixer.Sound("data/invalid.wav"),
-            "won": pygame.mixer.Sound("data/won.wav"),
-            "bad": pygame.mixer.Sound("data/bad.wav"),
-        }
+        self.sound_files = dict(sound_files)
+        self.sounds = {}
+        self.loader = None
+        self.loading = 0
+        if threading:
+            self.music_queue = MusicQueue(threading.Lock())
+        else:
+            self.music_queue = MusicQueue()
+
         pygame.mixer.stop()
-        tmp_sound = pygame.mixer.Sound("data/opening.ogg")
-        #tmp_sound = pygame.mixer.Sound("test.wav")
-        tmp_sound.play()
+        pygame.mixer.music.load("data/opening.ogg")
+        pygame.mixer.music.play()
+        if threading:
+            self.loading = 1
+            self.loader = threading.Thread(target = self._load_sounds)
+            self.loader.setDaemon(1)
+            self.loader.start()
+#}}}
+
+    def _load_sounds(self):#{{{
+        """Decode every sound, in the order _init_sounds() describes.
 
-        self.music_queue = MusicQueue()
+        This function stops early, between two sounds, once close() has
+        cleared self.loading.
+        """
+        jobs = [(self._get_sound, name) for name, filename in sound_files
+                if name not in rare_sounds]
+        jobs.extend([(self.music_queue._get_clip, filename)
+                     for filename in speech_clips])
+        jobs.extend([(self._get_sound, name) for name in rare_sounds])
+        for load, name in jobs:
+            if not self.loading:
+                return
+            load(name)
+#}}}
+
+    def _get_sound(self, name):#{{{
+        """Provide the sound for a feedback string, decoding it if needed.
+
+        Sounds are decoded through MusicQueue._get_clip(), under its lock,
+        so the digit sounds, which are speech clips too, are decoded once.
+        """
+        sound = self.sounds.get(name)
+        if sound is None:
+            sound = self.music_queue._get_clip(self.sound_files[name])
+            self.sounds[name] = sound
+        return sound
+#}}}
+
+    def close(self):#{{{
+        """Stop the background loading of sounds.
+
+        This function asks the loader thread to stop and waits for the sound
+        it is decoding, if any, so that no decode is cut short when the
+        program exits.
+        """
+        self.loading = 0
+        if self.loader is not None:
+            self.loader.join()
+            self.loader = None
+#}}}
+
+    def _stop_sounds(self):#{{{
+        """Stop every sound playing, including streamed narration."""
+        pygame.mixer.stop()
+        pygame.mixer.music.stop()
 #}}}
 
     def _init_fonts(self):#{{{
@@ -223,7 +398,9 @@ class SDL_UI:
         requisite pieces and calculating the minimum size from them.  Since
         all pieces must be the same width, the final width for all pieces --
         the maximum among all the parts' widths -- is stored at the
-        function's end.
+        function's end.  The playing field is sized for the view of the
+        board, view_cols by view_rows tiles, which is the whole board when it
+        fits.
         """
         for num in range(1, 9):
             text = self.font.render(`num`, 1, (0, 0, 0))
@@ -233,9 +410,6 @@ class SDL_UI:
             imagesize = max(image.get_size()) + 3
             self.tilesize = max(self.tilesize, imagesize)
 
-        self.xsize = (self.cols * self.tilesize) + (self.cols - 1)
-        self.ysize = (self.rows * self.tilesize) + (self.rows - 1)
-
         self.restart_button, self.restart_pressed = \
                              self._make_header_button('New Game')
         self.quit_button, self.quit_pressed = self._make_header_button('Quit')
@@ -254,6 +428,18 @@ class SDL_UI:
         self.statusbar_width = (self.flag_text.get_width() +
                                 self.time_text.get_width() + 25)
 
+        step = self.tilesize + 1
+        self.view_cols = min(self.cols, self.max_view_cols)
+        self.view_rows = min(self.rows, self.max_view_rows)
+        display_width, display_height = self.display_size
+        if display_width > 0 and display_height > 0:
+            room = (display_height - self.header_height -
+                    self.font.size('I')[1] - 7)
+            self.view_cols = max(1, min(self.view_cols, display_width / step))
+            self.view_rows = max(1, min(self.view_rows, room / step))
+        self.xsize = (self.view_cols * self.tilesize) + (self.view_cols - 1)
+        self.ysize = (self.view_rows * self.tilesize) + (self.view_rows - 1)
+
         self.max_width = max((self.xsize, self.header_width,
                               self.statusbar_width))
 #}}}
@@ -302,16 +488,21 @@ class SDL_UI:
         """
         screen_ysize = (self.ysize + self.header_height +
                         self.font.size('I')[1] + 7)
+        # No HWSURFACE|DOUBLEBUF: update_game() redraws only the changed
+        # rectangles with display.update(), which never swaps a back buffer.
         self.screen = pygame.display.set_mode((self.max_width,
-                                   screen_ysize), HWSURFACE|DOUBLEBUF)
+                                   screen_ysize), 0, self.depth)
         pygame.display.set_caption('Blind Minesweeper')
-        self.flag_text.convert()
-        self.time_text.convert()
-        self.statusbar.convert()
-        self.quit_button.convert()
-        self.quit_pressed.convert()
-        self.restart_button.convert()
-        self.restart_pressed.convert()
+        self.flag_img = self._convert(self.flag_img)
+        self.mine_img = self._convert(self.mine_img)
+        self.flag_text = self._convert(self.flag_text)
+        self.time_text = self._convert(self.time_text)
+        self.header = self._convert(self.header)
+        self.statusbar = self._convert(self.statusbar)
+        self.quit_button = self._convert(self.quit_button)
+        self.quit_pressed = self._convert(self.quit_pressed)
+        self.restart_button = self._convert(self.restart_button)
+        self.restart_pressed = self._convert(self.restart_pressed)
 #}}}
 
     def _init_bg(self):#{{{
@@ -352,7 +543,7 @@ class SDL_UI:
                          (self.xsize, self.ysize))
         pygame.draw.line(self.bg, (125, 125, 125), (self.xsize, 0),
                          (self.xsize, self.ysize))
-        self.bg.convert()
+        self.bg = self._convert(self.bg)
         if self.xsize >= self.max_width:
             self.bgwborder = self.bg
             self.xmargin = 0
@@ -362,7 +553,7 @@ class SDL_UI:
             self.xmargin = int(math.floor(x_difference / 2.0))
             self.bgwborder.fill((150, 150, 150))
             self.bgwborder.blit(self.bg, (self.xmargin, 0))
-            self.bgwborder.convert()
+            self.bgwborder = self._convert(self.bgwborder)
 #}}}
 
     def _init_surfaces(self):#{{{
@@ -381,17 +572,27 @@ class SDL_UI:
         clear returns tiles to their original look after overlay has been
          blit on them; it is a square over transparency, with two light edges
          and two dark edges.
+        digits maps each number from 1 to 8 to its rendered text and the
+         offset which centers it in a tile; mine_offset and flag_offset do
+         the same for the mine and flag images.
+        tiles is the tile atlas: it maps every look a field tile can have to
+         a single surface, composited from the surfaces above and converted
+         with _convert(), so that each tile is drawn with one blit.
+         The numbers 0 to 8 are opened tiles, -1 is an exploded mine and -2
+         an opened tile crossed out; 'unknown', 'flagged', 'wrongflag' (a
+         flag shown wrong once the game is lost), and 'mine' (a mine shown
+         once the game is lost) are closed tiles.
         """
         tilesize = self.tilesize
         tileend = self.tilesize - 1
 
         self.unflag = pygame.Surface((tilesize - 2, tilesize - 2))
         self.unflag.fill((175, 175, 175))
-        self.unflag.convert()
+        self.unflag = self._convert(self.unflag)
 
         self.redtile = pygame.Surface((tilesize, tilesize))
         self.redtile.fill((255, 0, 0))
-        self.redtile.convert()
+        self.redtile = self._convert(self.redtile)
 
         self.badflag = pygame.Surface((tilesize, tilesize))
         self.badflag.fill((0, 255, 0))
@@ -400,14 +601,14 @@ class SDL_UI:
         pygame.draw.line(self.badflag, (255, 0, 0), (0, tileend - 2),
                          (tileend - 2, 0), 10)
         self.badflag.set_colorkey((0, 255, 0))
-        self.badflag.convert()
+        self.badflag = self._convert(self.badflag)
 
         self.overlay = pygame.Surface((tilesize, tilesize))
         self.overlay.fill((175, 175, 175))
         pygame.draw.rect(self.overlay, (0, 255, 0),
                          (1, 1, tileend - 2, tileend - 2), 0)
         self.overlay.set_colorkey((0, 255, 0))
-        self.overlay.convert()
+        self.overlay = self._convert(self.overlay)
 
         self.clear = pygame.Surface((tilesize, tilesize))
         self.clear.fill((0, 255, 0))
@@ -418,7 +619,7 @@ class SDL_UI:
                          (tileend, tileend))
         pygame.draw.line(self.clear, (125, 125, 125), (tileend, 0),
                          (tileend, tileend))
-        self.clear.convert()
+        self.clear = self._convert(self.clear)
 
         self.pushed = pygame.Surface((tilesize, tilesize))
         self.pushed.fill((225, 225, 225))
@@ -431,19 +632,58 @@ class SDL_UI:
         self.cursortile.fill((0, 255, 0))
         self.cursortile.set_colorkey((0, 255, 0))
         pygame.draw.rect(self.cursortile, (255, 0, 0), (3, 3, tileend-6, tileend-6), 5)
-        self.cursortile.convert()
+        self.cursortile = self._convert(self.cursortile)
 
         self.cursorclear2 = pygame.Surface((tilesize, tilesize))
         self.cursorclear2.fill((0, 255, 0))
         self.cursorclear2.set_colorkey((0, 255, 0))
         pygame.draw.rect(self.cursorclear2, (0, 0, 0), (3, 3, tileend-6, tileend-6), 5)
-        self.cursorclear2.convert()
+        self.cursorclear2 = self._convert(self.cursorclear2)
 
         self.cursorclear1 = pygame.Surface((tilesize, tilesize))
         self.cursorclear1.fill((0, 255, 0))
         self.cursorclear1.set_colorkey((0, 255, 0))
         pygame.draw.rect(self.cursorclear1, (175, 175, 175), (3, 3, tileend-6, tileend-6), 5)
-        self.cursorclear1.convert()
+        self.cursorclear1 = self._convert(self.cursorclear1)
+
+        self.digits = {}
+        for num in range(1, 9):
+            text = self.font.render(`num`, 1, colors[num])
+            self.digits[num] = (text, self._get_rect_pos(text, (0, 0))[:2])
+        self.mine_offset = self._get_rect_pos(self.mine_img, (0, 0))[:2]
+        self.flag_offset = self._get_rect_pos(self.flag_img, (0, 0))[:2]
+
+        closed = [(self.unflag, (0, 0)), (self.clear, (0, 0))]
+        layers = {-2: [(self.unflag, (0, 0)), (self.badflag, (0, 0))],
+                  -1: [(self.redtile, (0, 0)),
+                       (self.mine_img, self.mine_offset)],
+                  0: [(self.pushed, (0, 0))],
+                  'unknown': [(self.unflag, (1, 1)), (self.clear, (0, 0))],
+                  'flagged': closed + [(self.flag_img, self.flag_offset)],
+                  'wrongflag': closed + [(self.mine_img, self.mine_offset),
+                                         (self.badflag, (0, 0))],
+                  'mine': closed + [(self.mine_img, self.mine_offset)]}
+        for num in range(1, 9):
+            layers[num] = [(self.pushed, (0, 0)), self.digits[num]]
+        self.tiles = {}
+        for key, surfaces in layers.items():
+            tile = pygame.Surface((tilesize, tilesize))
+            tile.fill((175, 175, 175))
+            for surface, offset in surfaces:
+                tile.blit(surface, offset)
+            self.tiles[key] = self._convert(tile)
+#}}}
+
+    def _convert(self, surface):#{{{
+        """Provide a surface in the display's pixel format.
+
+        This function returns a copy of surface converted to the pixel
+        format of the display, so that blitting it needs no conversion.
+        Surfaces with per-pixel alpha, such as rendered text, keep it.
+        """
+        if surface.get_flags() & SRCALPHA:
+            return surface.convert_alpha()
+        return surface.convert()
 #}}}
 
     def _make_header_button(self, text):#{{{
@@ -496,22 +736,58 @@ class SDL_UI:
 
         This function will return a 2-tuple containing the coordinates of
         the tile which contains the given screen position.  If the position
-        is not part of a tile, a -1 will be in the coordinate pair.
+        is not part of a tile in view, a -1 will be in the coordinate pair.
+        The grid line before a tile counts as part of it.
 
         pos is the position to be converted.
         """
-        coords = [-1, -1]
-        for axissize, margin, index in [(self.xsize, self.xmargin, 0),
-                                        (self.ysize, self.header_height, 1)]:
-            value = -1
-            if pos[index] >= margin:
-                for pixel in range(margin + self.tilesize,
-                                   margin + axissize + 1, self.tilesize + 1):
-                    value = value + 1
-                    if pos[index] < pixel:
-                        coords[index] = value
-                        break
-        return tuple(coords)
+        step = self.tilesize + 1
+        x = pos[0] - self.xmargin
+        y = pos[1] - self.header_height
+        # Counting from the pixel before each tile puts every grid line in
+        # the tile after it.
+        if x < 0 or x + 1 >= self.view_cols * step:
+            x = -1
+        else:
+            x = (x + 1) / step + self.view_x
+        if y < 0 or y + 1 >= self.view_rows * step:
+            y = -1
+        else:
+            y = (y + 1) / step + self.view_y
+        return (x, y)
+#}}}
+
+    def _get_coords_list(self, positions):#{{{
+        """Provide the coordinates of the tiles at many screen positions.
+
+        This function returns a list of what _get_coords() returns for each
+        position in a sequence, such as a recorded trace of mouse motion.
+        If NumPy is available, the whole sequence is converted at once with
+        array arithmetic; it is imported only here, since nothing else in
+        the game needs it.  Without NumPy, the positions are converted one
+        at a time.
+
+        positions is a sequence of screen positions.
+        """
+        try:
+            import numpy
+        except ImportError:
+            return [self._get_coords(pos) for pos in positions]
+        if len(positions) == 0:
+            return []
+        step = self.tilesize + 1
+        points = numpy.fromiter(itertools.chain.from_iterable(positions),
+                                int, 2 * len(positions))
+        coords = []
+        for pixels, margin, count, offset in \
+                ((points[0::2], self.xmargin, self.view_cols, self.view_x),
+                 (points[1::2], self.header_height, self.view_rows,
+                  self.view_y)):
+            pixels = pixels - margin
+            inside = (pixels >= 0) & (pixels + 1 < count * step)
+            coords.append(numpy.where(inside, (pixels + 1) // step + offset,
+                                      -1).tolist())
+        return zip(coords[0], coords[1])
 #}}}
 
     def _get_pos(self, coords):#{{{
@@ -519,11 +795,15 @@ class SDL_UI:
 
         This function will return a 2-tuple containing the screen position
         of the upper-left pixel of a field tile, given its raw coordinates.
+        The position is relative to the view, and is off the playing field
+        for tiles out of view.
 
         coords is the tile's coordinates, in a 2-sequence.
         """
-        return ((coords[0] * self.tilesize) + coords[0] + self.xmargin,
-                (coords[1] * self.tilesize) + coords[1] + self.header_height)
+        x = coords[0] - self.view_x
+        y = coords[1] - self.view_y
+        return ((x * self.tilesize) + x + self.xmargin,
+                (y * self.tilesize) + y + self.header_height)
 #}}}
 
     def _get_rect_pos(self, surface, pos):#{{{
@@ -548,19 +828,18 @@ class SDL_UI:
         """Mark a tile to be pressed.
 
         This function will add a coordinate pair to be drawn as 'pressed
-        down.'  It will also clear the list before adding the pair if
+        down.'  It will also clear the set before adding the pair if
         clobber is true.
 
         coords is the coordinates to be pressed, in a 2-sequence.  If
-        clobber is a true value, the list of coordinates to be pressed
+        clobber is a true value, the set of coordinates to be pressed
         will be emptied first.
         """
         if clobber:
-            self.pressed = []
+            self.pressed = set()
         if ((-1 not in coords) and (coords[0] < self.cols) and 
             (coords[1] < self.rows)):
-            if coords not in self.pressed:
-                self.pressed.append(coords)
+            self.pressed.add(tuple(coords))
 #}}}
 
     def _press_adjacent(self, coords):#{{{
@@ -572,7 +851,7 @@ class SDL_UI:
 
         coords is the coordinates of the base tile, in a 2-sequence.
         """
-        self.pressed = []
+        self.pressed = set()
         if -1 not in coords:
             x, y = coords
             adjlist = [(x - 1, y - 1), (x, y - 1), (x + 1, y - 1),
@@ -658,7 +937,7 @@ class SDL_UI:
             elif button is 2:
                 self._press_adjacent(coords)
             elif button is 3:
-                self.pressed = []
+                self.pressed = set()
 #}}}
 
     def _act_on_field(self, coords, button, actions):#{{{
@@ -672,7 +951,7 @@ class SDL_UI:
         coords is grid based value
         button is the mouse button released.
         """
-        self.pressed = []
+        self.pressed = set()
         if -1 not in coords:
             if button is 1:
                 actions.append(('open', coords))
@@ -699,7 +978,9 @@ class SDL_UI:
         action.
         """
         actions = []
-        for event in pygame.event.get():
+        events = self.waited + pygame.event.get()
+        self.waited = []
+        for event in events:
             if event.type is QUIT:
                 actions.extend([('quit', (-1, -1))])
             elif event.type is KEYDOWN:
@@ -707,11 +988,11 @@ class SDL_UI:
                     actions.extend([('quit', (-1, -1))])
                 elif (event.key == K_n):
                     actions.extend([('reset', (-1, -1))])
-                    pygame.mixer.stop()
+                    self._stop_sounds()
                 elif (event.key == K_F1):
-                    pygame.mixer.stop()
-                    tmp_sound = pygame.mixer.Sound("data/howto.ogg")
-                    tmp_sound.play()
+                    self._stop_sounds()
+                    pygame.mixer.music.load("data/howto.ogg")
+                    pygame.mixer.music.play()
                 elif event.key == K_F2:
                     actions.extend([('menu', (-1, -1))])
                 elif event.key == K_TAB:
@@ -743,7 +1024,7 @@ class SDL_UI:
                         self._draw(self.restart_pressed,
                                    self.restart_place[:2])
                         self.last_object = 'restart'
-                        pygame.mixer.stop()
+                        self._stop_sounds()
                     elif self.quit_place.collidepoint(event.pos):
                         self._draw(self.quit_pressed, self.quit_place[:2])
                         self.last_object = 'quit'
@@ -783,64 +1064,164 @@ class SDL_UI:
         return actions
 #}}}
 
-    def update_game(self, board, rows, cols, flags, time, second, won, cursor):
-        for j in range(cols):
-            for i in range(rows):
-                pos = self._get_pos((i, j))
-
-                if board[i][j][1] == -1: # opened
-                    d = board[i][j][0]
-                    if d == -2:
-                        self._draw(self.unflag, pos)
-                        self._draw(self.badflag, pos)
-                    elif d == -1:
-                        self._draw(self.redtile, pos)
-                        to_draw = self.mine_img
-                        draw_pos = self._get_rect_pos(self.mine_img, pos)[:2]
-                        self._draw(to_draw, draw_pos)
-                    elif d == 0:
-                        self._draw(self.pushed, pos)
-                    else:
-                        self._draw(self.pushed, pos)
-                        to_draw = self.font.render(`d`, 1, colors[d])
-                        draw_pos = self._get_rect_pos(to_draw, pos)[:2]
-                        self._draw(to_draw, draw_pos)
-                elif board[i][j][1] == 0: # unflagged
-                    to_draw = self.unflag
-                    draw_pos = ( pos[0] + 1, pos[1] + 1 )
-                    self._draw(to_draw, draw_pos)
-                    self._draw(self.clear, pos)
-                else: # flagged
-                    if won == -1 and board[i][j][0] == -2:
-                        self._draw(self.unflag, pos)
-                        self._draw(self.clear, pos)
-                        to_draw = self.mine_img
-                        draw_pos = self._get_rect_pos(self.mine_img, pos)[:2]
-                        self._draw(to_draw, draw_pos)
-                        self._draw(self.badflag, pos)
-                    else:
-                        self._draw(self.unflag, pos)
-                        self._draw(self.clear, pos)
-                        to_draw = self.flag_img
-                        draw_pos = self._get_rect_pos(to_draw, pos)[:2]
-                        self._draw(to_draw, draw_pos)
-                
-        self._draw(self.cursortile, self._get_pos(cursor))
+    def _draw_tile(self, board, coords, won):#{{{
+        """Draw a single field tile.
+
+        This function draws the tile at the given coordinates as it appears
+        on the given board, with a single blit from the tile atlas, and
+        records the change through _draw().  Tiles out of view are not
+        drawn.
+
+        board is the field's board; coords is the tile's coordinates, in a
+        2-sequence.  won is the value of Field.won(); once the game is lost,
+        mines and misplaced flags are revealed.
+        """
+        x, y = coords
+        if not (0 <= x - self.view_x < self.view_cols and
+                0 <= y - self.view_y < self.view_rows):
+            return
+        value, state = board[x][y]
+        if state == -1: # opened
+            tile = self.tiles[value]
+        elif state == 0: # unflagged
+            if won == -1 and value == -1:
+                tile = self.tiles['mine']
+            else:
+                tile = self.tiles['unknown']
+        else: # flagged
+            if won == -1 and value == -2:
+                tile = self.tiles['wrongflag']
+            else:
+                tile = self.tiles['flagged']
+        self._draw(tile, self._get_pos(coords))
+#}}}
+
+    def _follow(self, cursor):#{{{
+        """Move the view, if needed, so that it shows the cursor.
+
+        The view is moved by as few tiles as possible.  The function returns
+        the number of columns and rows it moved by, in a 2-tuple.
+        """
+        view_x = self.view_x
+        view_y = self.view_y
+        if cursor[0] < self.view_x:
+            self.view_x = cursor[0]
+        elif cursor[0] >= self.view_x + self.view_cols:
+            self.view_x = cursor[0] - self.view_cols + 1
+        if cursor[1] < self.view_y:
+            self.view_y = cursor[1]
+        elif cursor[1] >= self.view_y + self.view_rows:
+            self.view_y = cursor[1] - self.view_rows + 1
+        return self.view_x - view_x, self.view_y - view_y
+#}}}
+
+    def _scroll(self, board, dx, dy, won):#{{{
+        """Scroll the playing field after the view has moved.
+
+        This function moves what is already drawn on the playing field by
+        dx columns and dy rows, and draws only the tiles which have come into
+        view.  It returns a list of the coordinates of those tiles.
+
+        board is the field's board; won is the value of Field.won().
+        """
+        step = self.tilesize + 1
+        field = Rect(self.xmargin, self.header_height, self.xsize, self.ysize)
+        self.screen.set_clip(field)
+        self.screen.scroll(-dx * step, -dy * step)
+        self.screen.set_clip(None)
+        self.newdraws.append(tuple(field))
+
+        xs = range(self.view_x, self.view_x + self.view_cols)
+        ys = range(self.view_y, self.view_y + self.view_rows)
+        if dx > 0:
+            new_xs = xs[-dx:]
+        else:
+            new_xs = xs[:-dx]
+        if dy > 0:
+            new_ys = ys[-dy:]
+        else:
+            new_ys = ys[:-dy]
+        exposed = [(x, y) for x in new_xs for y in ys]
+        exposed.extend([(x, y) for x in xs if x not in new_xs
+                        for y in new_ys])
+        for coords in exposed:
+            self._draw_tile(board, coords, won)
+        return exposed
+#}}}
+
+    def update_game(self, board, rows, cols, flags, time, won, cursor,
+                    changed = None):#{{{
+        """Draw the current game state.
+
+        This function redraws the field tiles which have changed, the
+        tiles pressed or released by the mouse, the cursor, and the
+        statusbar, and then updates only the screen areas that were drawn
+        on.  The whole field is redrawn after a reset, when the game is won
+        or lost, or when changed is None.  Only tiles in view are drawn; when
+        the cursor leaves the view, the view follows it, scrolling the
+        playing field when part of it is still in view.
+
+        changed is a sequence of the coordinates of tiles whose state has
+        changed since the last call, as reported by Field.open() and
+        Field.flag().
+        """
+        cursor = tuple(cursor)
+        pressed = self.pressed
+        full = (changed is None or won != self.last_won)
+        dx, dy = self._follow(cursor)
+        if ((dx or dy) and not full and abs(dx) < self.view_cols and
+            abs(dy) < self.view_rows):
+            scrolled = self._scroll(board, dx, dy, won)
+        elif dx or dy:
+            full = 1
+        if full:
+            for x in range(self.view_x, self.view_x + self.view_cols):
+                for y in range(self.view_y, self.view_y + self.view_rows):
+                    self._draw_tile(board, (x, y), won)
+            redraw_cursor = 1
+            pressing = pressed
+        else:
+            redrawn = [tuple(coords) for coords in changed]
+            redraw_cursor = (cursor != self.prev_cursor)
+            if redraw_cursor and self.prev_cursor:
+                redrawn.append(self.prev_cursor)
+            for coords in redrawn:
+                self._draw_tile(board, coords, won)
+            if dx or dy:
+                redrawn.extend(scrolled)
+            # Only tiles entering or leaving the pressed state are drawn,
+            # along with pressed tiles that were just redrawn plain.
+            released = self.pressed_last - pressed
+            for coords in released:
+                self._draw_tile(board, coords, won)
+            pressing = (pressed - self.pressed_last).union(
+                pressed.intersection(redrawn))
+            if cursor in released or cursor in pressing or cursor in redrawn:
+                redraw_cursor = 1
+        for coords in pressing:
+            if (0 <= coords[0] - self.view_x < self.view_cols and
+                0 <= coords[1] - self.view_y < self.view_rows and
+                board[coords[0]][coords[1]][1] == 0):
+                self._draw(self.overlay, self._get_pos(coords))
+        self.pressed_last = set(pressed)
+        if redraw_cursor:
+            self._draw(self.cursortile, self._get_pos(cursor))
+        self.prev_cursor = cursor
+        self.last_won = won
 
         if self.active and won == 1:
             self._update_status(flags, time, (0, 0, 255))
-            self.feedback("elapsed %d"% second)
-            self.feedback("won")
             self.active = 0
         elif self.active and won == -1:
             self._update_status(flags, time, (255, 0, 0))
-            self.feedback("bad")
             self.active = 0
         elif self.active:
             self._update_status(flags, time)
 
-        pygame.display.flip()
-        
+        if self.newdraws:
+            pygame.display.update(self.newdraws)
+            self.newdraws = []
+#}}}
 
     def reset(self, rows, cols, mines, tilesize = None):#{{{
         """Set up the interface for a new game.
@@ -875,33 +1256,42 @@ class SDL_UI:
 #}}}
 
     def wait(self):#{{{
-        """Sleep a bit to give the CPU time to breathe."""
-        time.sleep(.05)
+        """Block until there is something to handle.
+
+        This function sleeps until an event arrives -- input, the end of a
+        queued sound, or the once-a-second clock tick -- so the game uses no
+        CPU while idle and reacts to a keypress as soon as it happens.  The
+        event is kept for the next call to get_input().
+        """
+        self.waited.append(pygame.event.wait())
 #}}}
 
     def feedback(self, str):#{{{
         if str[:6] == 'number':
+            clips = []
             #self.music_queue.empty()
-            self.music_queue.append("data/number_of_mines.wav")
+            clips.append("data/number_of_mines.wav")
             l = str[6:].split()
             filename = "data/n%s.wav" % l[0]
-            self.music_queue.append( filename )
+            clips.append( filename )
 
-            self.music_queue.append( "data/number_of_flag.wav")
+            clips.append( "data/number_of_flag.wav")
 
             filename = "data/n%s.wav" % l[1]
-            self.music_queue.append( filename )
+            clips.append( filename )
+            self.music_queue.append_phrase(str, clips)
             self.music_queue.play()
             return
 
 
         if str[:7] == 'elapsed':
+            clips = []
             l = int(str[7:])
 
             if (l >= 10000):
-                self.music_queue.append( "data/toolongtime.wav" )
+                clips.append( "data/toolongtime.wav" )
             else:
-                self.music_queue.append( "data/elapsed_time.wav" )
+                clips.append( "data/elapsed_time.wav" )
                 thousand = l / 1000
                 hundred = (l - thousand*1000) / 100
                 ten = (l - thousand*1000 - hundred*100) / 10
@@ -909,32 +1299,35 @@ class SDL_UI:
 
                 if (thousand != 0):
                     if (thousand != 0):
-                        self.music_queue.append( "data/%d.wav" % thousand )
-                    self.music_queue.append( "data/1000.wav" )
+                        clips.append( "data/%d.wav" % thousand )
+                    clips.append( "data/1000.wav" )
                 if (hundred != 0):
                     if (hundred != 1):
-                        self.music_queue.append( "data/%d.wav" % hundred )
-                    self.music_queue.append( "data/100.wav" )
+                        clips.append( "data/%d.wav" % hundred )
+                    clips.append( "data/100.wav" )
                 if (ten != 0):
                     if (ten != 1):
-                        self.music_queue.append( "data/%d.wav" % ten )
-                    self.music_queue.append( "data/10.wav" )
+                        clips.append( "data/%d.wav" % ten )
+                    clips.append( "data/10.wav" )
                 if (one != 0 or thousand == 0 and hundred==0 and ten==0):
-                    self.music_queue.append( "data/%d.wav" % one )
+                    clips.append( "data/%d.wav" % one )
 
-                self.music_queue.append( "data/second.wav")
+                clips.append( "data/second.wav")
 
+            self.music_queue.append_phrase(str, clips)
             self.music_queue.play()
             return
 
         if str[:8] == 'position':
-            self.music_queue.append("data/current_position.wav")
+            clips = []
+            clips.append("data/current_position.wav")
             l = str[8:].split()
             filename = "data/%s.wav" % l[0]
-            self.music_queue.append( filename )
-            self.music_queue.append("data/comma.wav")
+            clips.append( filename )
+            clips.append("data/comma.wav")
             filename = "data/%s.wav" % l[1]
-            self.music_queue.append(filename)
+            clips.append(filename)
+            self.music_queue.append_phrase(str, clips)
             self.music_queue.play()
             return
 
@@ -954,8 +1347,8 @@ class SDL_UI:
             #self.music_queue.play()
             return
 
-        if self.sounds.has_key(str):
-            self.sounds[str].play()
+        if self.sound_files.has_key(str):
+            self._get_sound(str).play()
         else:
             print "no sound",
         print str
@@ -0,0 +1,316 @@
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation; either version 2 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA, 02111-1307.
+
+from game import Field
+
+
+class Session:
+    """Play a game of Blindmine without any user interface.
+
+    This class holds a Field together with the keyboard cursor and the other
+    state the player builds up, and applies the actions produced by
+    SDL_UI.get_input() to them.  It imports nothing from pygame and never
+    sleeps, so it can drive the game for bots and servers as well as for
+    blindmine.run().
+    """
+    def __init__(self, rows = 9, cols = 9, mines = 10, rng = None):
+        """Initialize the session and start its first game.
+
+        rows, cols, and mines are the size of the playing field and the
+        number of mines in it.  rng is the random.Random instance handed to
+        every Field; if it is not given, the random module itself is used.
+        """
+        self.rows = rows
+        self.cols = cols
+        self.mines = mines
+        self.rng = rng
+        self.saved = []
+        self.examine_keydown = [ 0, 0, 0, 0, 0, 0, 0, 0, 0 ]
+        self.direction_keydown = [ 0, 0 ]
+        self.tab_used = [0, 0]
+        self.quit = 0
+        self.new_game()
+
+    def new_game(self):
+        """Start a new game on a fresh field."""
+        self.field = Field(self.rows, self.cols, self.mines, self.rng)
+        self.cursor = [0, 0]
+        self.changed = []
+        self.opening = None
+        self.restart = 0
+        self.over = 0
+
+    def _field_do(self, field_func, pos):
+        """Apply a field function at pos, or next to it if an examine key
+        is held down, and return its result and the coordinates used."""
+        for key in range(0, 9):
+            if self.examine_keydown[key]:
+                tmp_x = pos[0] + (key / 3 - 1)
+                tmp_y = pos[1] + (key % 3 - 1)
+                if ((0 <= tmp_x < self.cols) or
+                    (0 <= tmp_y < self.rows)):
+                    return field_func(tmp_x, tmp_y), (tmp_x, tmp_y)
+
+        return field_func(pos[0], pos[1]), (pos[0], pos[1])
+
+    def _information(self):
+        """Describe the tile under the cursor and its surroundings."""
+        field = self.field
+        cursor = self.cursor
+        n_unveiled, n_unknown, n_flagged = field.get_adjacent_info(cursor[0],
+                                                                   cursor[1])
+        return ("information %s %d %d %d %d" %
+                (field.read(cursor[0], cursor[1]),
+                 n_flagged, n_unknown, cursor[0]+1, cursor[1]+1))
+
+    def _apply(self, act, pos, feedback):
+        """Apply a single action.
+
+        act and pos are one of the 2-tuples passed to step(); the feedback
+        strings the action produces are appended to the list feedback.
+        """
+        if self.opening is not None:
+            self._open_rest()
+        field = self.field
+        cursor = self.cursor
+        changed = self.changed
+
+        # cursor_*
+        if act in ['cursor_sweep', 'cursor_flag' ]:
+            pos = cursor
+
+        # menu
+        if act == 'quit':
+            self.quit = 1
+        elif act == 'reset':
+            self.restart = 1
+
+        # cursor pressed -> move and store pressed key information
+        elif act == 'direction_pressed':
+            if pos[0]:
+                self.direction_keydown[0] = pos[0]
+            if pos[1]:
+                self.direction_keydown[1] = pos[1]
+            cursor[0] = cursor[0] + pos[0]
+            cursor[1] = cursor[1] + pos[1]
+
+        elif act == 'direction_up':
+            if pos[0]:
+                self.direction_keydown[0] = 0
+                self.tab_used[0] = 0
+            if pos[1]:
+                self.direction_keydown[1] = 0
+                self.tab_used[1] = 0
+
+        elif act == 'tab':
+            direction_keydown = self.direction_keydown
+            if direction_keydown[0] or direction_keydown[1]:
+                self.tab_used = [1, 1]
+                def tab_group(symbol):
+                    if symbol == 'unknown':
+                        return -1
+                    elif symbol == 'out':
+                        return -2
+                    else:
+                        return -3
+
+                mark = field.read( cursor[0], cursor[1] )
+                mark = tab_group(mark)
+                iter_num = 0
+
+                while 1:
+                    new_cursor0 = cursor[0] + direction_keydown[0]
+                    new_cursor1 = cursor[1] + direction_keydown[1]
+                    new_mark = field.read(new_cursor0, new_cursor1)
+                    new_mark = tab_group(new_mark)
+
+                    if new_mark == -2 or iter_num > 0 and mark != new_mark:
+                        break
+                    cursor[0] = new_cursor0; cursor[1] = new_cursor1
+                    mark = new_mark
+                    iter_num = iter_num + 1
+                feedback.append("position %d %d" %
+                                (cursor[0]+1, cursor[1]+1))
+
+        # inform
+        elif act == 'inform':
+            feedback.append("number %d %d" % (field.mines, field.flags))
+            feedback.append("position %d %d" % (cursor[0]+1, cursor[1]+1))
+            feedback.append("elapsed %d" % field.playtime_in_second())
+
+        # load/save
+        elif act == 'save_position':
+            feedback.append("position %d %d" % (cursor[0]+1, cursor[1]+1))
+            self.saved = [ cursor[0], cursor[1] ]
+        elif act == 'load_position':
+            if self.saved:
+                cursor[0] = self.saved[0]
+                cursor[1] = self.saved[1]
+            feedback.append("position %d %d" % (cursor[0]+1, cursor[1]+1))
+
+        # examine
+        elif act == 'examine_pressed':
+            feedback.append(field.read(cursor[0] + pos[0],
+                                       cursor[1] + pos[1]))
+            self.examine_keydown[(pos[0]+1)*3 + (pos[1]+1)] = 1
+        elif act == 'examine_up':
+            self.examine_keydown[(pos[0]+1)*3 + (pos[1]+1)] = 0
+
+        elif act in ('open', 'sweep', 'cursor_sweep'):
+            if act == 'cursor_sweep':
+                mark = field.read( pos[0], pos[1] )
+                if mark == 'unknown':
+                    act = 'cursor_open'
+
+            if act == 'open':
+                opened = field.iter_open(pos[0], pos[1])
+            elif act == 'cursor_sweep':
+                opened, _ = self._field_do(field.open_adjacent, pos)
+            elif act == 'cursor_open':
+                opened, _ = self._field_do(field.iter_open, pos)
+            else:
+                opened = field.open_adjacent(pos[0], pos[1])
+
+            if act == 'open' or act == 'cursor_open':
+                # Take just enough of the cascade to choose the sound; the
+                # rest is left in self.opening for finish() to open once
+                # the sound is playing.
+                opening = opened
+                opened = []
+                for result in opening:
+                    opened.append(result)
+                    if len(opened) == 2:
+                        break
+
+            if (act == 'cursor_sweep' or act == 'sweep') and opened:
+                feedback.append("sweep")
+            elif (act == 'open' or act == 'cursor_open') and opened:
+                if len(opened) > 1:
+                    feedback.append("openmany")
+                else:
+                    feedback.append("open")
+                feedback.append("%d" % opened[0][1])
+                if len(opened) == 2:
+                    self.opening = opening
+            else:
+                feedback.append("invalid")
+                feedback.append(self._information())
+
+            for coords, count in opened:
+                changed.append(coords)
+            # Only the first result can be a mine, so the rest of a cascade
+            # need not be checked.
+            for result in opened:
+                if result[1] == 0:
+                    break  # We couldn't have hit any mines.
+                if result[1] == -1:
+                    field.lose = 1
+                    break
+        elif act == 'flag' or act == 'cursor_flag':
+            if act == 'cursor_flag':
+                result, pos = self._field_do(field.flag, pos)
+            else:
+                result = field.flag(pos[0], pos[1])
+            if result == 1:
+                feedback.append("flagged")
+                changed.append(pos)
+            elif result == 0:
+                feedback.append("unflagged")
+                changed.append(pos)
+
+    def _open_rest(self):
+        """Open the rest of the pending cascade, adding its tiles to
+        self.changed."""
+        opening = self.opening
+        self.opening = None
+        changed = self.changed
+        for coords, count in opening:
+            changed.append(coords)
+
+    def _check_over(self, feedback):
+        """Append the feedback for a game which has just been won or lost."""
+        field = self.field
+        if not self.over:
+            won = field.won()
+            if won == 1:
+                feedback.append("elapsed %d" % field.playtime_in_second())
+                feedback.append("won")
+                self.over = 1
+            elif won == -1:
+                feedback.append("bad")
+                self.over = 1
+
+    def step(self, actions, defer_cascade = 0):
+        """Apply a list of actions and return the resulting feedback.
+
+        actions is a list of (action, parameters) 2-tuples, as returned by
+        SDL_UI.get_input().  The return value is the list of feedback
+        strings the actions produced, in the order SDL_UI.feedback() should
+        announce them.  Afterwards, self.changed holds the coordinates of
+        every tile whose state changed; self.quit or self.restart is set if
+        the player asked to quit or to start a new game.
+
+        The whole of any cascade is opened before step() returns, unless
+        defer_cascade is true.  Then an open which starts a cascade only
+        opens its first tiles, enough to choose what to announce; the rest
+        is left in self.opening for the caller to open with finish(), once
+        the announcement is under way.  A cascade still left over is opened
+        by the next call to step() or finish().
+        """
+        field = self.field
+        cursor = self.cursor
+        feedback = []
+        self.changed = []
+        if self.opening is not None:
+            self._open_rest()
+
+        for act, pos in actions:
+            self._apply(act, pos, feedback)
+
+        # check for invalid input
+        if cursor[0] < 0:
+            cursor[0] = 0
+            feedback.append('out')
+        elif cursor[0] >= field.cols:
+            cursor[0] = field.cols-1
+            feedback.append('out')
+
+        if cursor[1] < 0:
+            cursor[1] = 0
+            feedback.append('out')
+        elif cursor[1] >= field.rows:
+            cursor[1] = field.rows-1
+            feedback.append('out')
+
+        if self.opening is not None and not defer_cascade:
+            self._open_rest()
+        self._check_over(feedback)
+        return feedback
+
+    def finish(self):
+        """Open the rest of the last cascade and return the resulting feedback.
+
+        This function opens the tiles step(actions, defer_cascade = 1) left
+        in self.opening, if any.
+        Afterwards, self.changed holds the coordinates of just those tiles,
+        and the feedback announces the end of the game if they won it.
+        """
+        feedback = []
+        self.changed = []
+        if self.opening is not None:
+            self._open_rest()
+        self._check_over(feedback)
+        return feedback
+
+# vim: ts=8 sts=4 sw=4 expandtab
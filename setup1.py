@@ -4,7 +4,7 @@ from distutils.core import setup
 import py2exe
       
 setup(windows=["blindmine.py"],
-    data_files=[(".", ["freesansbold.ttf", "LICENSE", "blindmine.py", "sdl_ui.py", "howto.txt", "README", "LICENSE", "opening.txt", "util.py", "game.py", "setup1.py", 
+    data_files=[(".", ["freesansbold.ttf", "LICENSE", "blindmine.py", "sdl_ui.py", "howto.txt", "README", "LICENSE", "opening.txt", "util.py", "game.py", "session.py", "tracing.py", "setup1.py", 
 	]),
 	("data", [
 "data/1.wav",
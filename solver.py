@@ -0,0 +1,241 @@
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation; either version 2 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA, 02111-1307.
+
+
+class Solver:
+    """Deduce safe tiles and certain mines on a Field.
+
+    This class keeps the frontier of a game -- the opened, numbered tiles
+    which still have unknown neighbors -- and derives from it which unknown
+    tiles must be safe and which must be mines.  Flagged tiles are taken to
+    be mines.
+
+    The frontier is kept incrementally: every result of Field.open() must
+    be passed to update(), and tiles are only dropped from the frontier once
+    they have no unknown neighbors left, so the board is never rescanned.
+    """
+    # Connected components with more unknown tiles than this are not
+    # enumerated, since the search grows exponentially with their size.
+    max_enumeration = 40
+
+    def __init__(self, field):
+        """Initialize the solver for the given field.
+
+        Any tiles already open on the field are added to the frontier.
+        """
+        self.field = field
+        self.frontier = {}
+        states = field.states
+        values = field.values
+        for index in xrange(field.rows * field.cols):
+            if states[index] == -1 and values[index] > 0:
+                self.frontier[index] = 1
+
+    def update(self, opened):
+        """Add newly opened tiles to the frontier.
+
+        opened is a list of results from Field.open(), Field.iter_open(), or
+        Field.open_adjacent().
+        """
+        rows = self.field.rows
+        for (x, y), count in opened:
+            if count > 0:
+                self.frontier[x * rows + y] = 1
+
+    def _constraints(self):
+        """Return the constraints given by the frontier.
+
+        The return value is a list of 2-tuples, one per frontier tile: a
+        tuple of the flat indices of its unknown neighbors, and the number
+        of mines among them.  Tiles with no unknown neighbors are dropped
+        from the frontier.
+        """
+        field = self.field
+        rows = field.rows
+        states = field.states
+        values = field.values
+        neighbors = field._get_neighbors()
+        constraints = []
+        for index in self.frontier.keys():
+            x, y = divmod(index, rows)
+            n_unveiled, n_unknown, n_flagged = field.get_adjacent_info(x, y)
+            if not n_unknown:
+                del self.frontier[index]
+                continue
+            unknown = tuple([adjindex for adjindex in neighbors[index]
+                             if states[adjindex] == 0])
+            constraints.append((unknown, values[index] - n_flagged))
+        return constraints
+
+    def _simple(self, constraints, safe, mines):
+        """Apply the single-tile rules to the constraints."""
+        for unknown, remaining in constraints:
+            if remaining == 0:
+                for index in unknown:
+                    safe[index] = 1
+            elif remaining == len(unknown):
+                for index in unknown:
+                    mines[index] = 1
+
+    def _subsets(self, constraints, safe, mines):
+        """Apply the subset rule to pairs of overlapping constraints.
+
+        If the unknown tiles of one constraint are a subset of another's,
+        the tiles only in the larger one hold the difference of their mine
+        counts.
+        """
+        by_tile = {}
+        for number in range(len(constraints)):
+            for index in constraints[number][0]:
+                by_tile.setdefault(index, []).append(number)
+        for unknown, remaining in constraints:
+            others = {}
+            for index in unknown:
+                for number in by_tile[index]:
+                    others[number] = 1
+            for number in others.keys():
+                other, other_remaining = constraints[number]
+                if len(other) <= len(unknown):
+                    continue
+                rest = [index for index in other if index not in unknown]
+                if len(rest) != len(other) - len(unknown):
+                    continue
+                difference = other_remaining - remaining
+                if difference == 0:
+                    for index in rest:
+                        safe[index] = 1
+                elif difference == len(rest):
+                    for index in rest:
+                        mines[index] = 1
+
+    def _components(self, constraints):
+        """Split the constraints into independent groups.
+
+        Two constraints belong to the same group if they share an unknown
+        tile.  The return value is a list of 2-tuples: the unknown tiles of
+        a group, ordered so that neighboring tiles are close together, and
+        the group's constraints.
+        """
+        by_tile = {}
+        for number in range(len(constraints)):
+            for index in constraints[number][0]:
+                by_tile.setdefault(index, []).append(number)
+        seen = {}
+        components = []
+        for start in range(len(constraints)):
+            if seen.has_key(start):
+                continue
+            seen[start] = 1
+            queue = [start]
+            tiles = []
+            tiles_seen = {}
+            members = []
+            while queue:
+                number = queue.pop(0)
+                members.append(constraints[number])
+                for index in constraints[number][0]:
+                    if tiles_seen.has_key(index):
+                        continue
+                    tiles_seen[index] = 1
+                    tiles.append(index)
+                    for other in by_tile[index]:
+                        if not seen.has_key(other):
+                            seen[other] = 1
+                            queue.append(other)
+            components.append((tiles, members))
+        return components
+
+    def _enumerate(self, tiles, constraints, safe, mines):
+        """Find every mine layout of a group, and record certain tiles.
+
+        A tile which is a mine in no layout consistent with the constraints
+        is safe; one which is a mine in all of them is a mine.
+        """
+        position = {}
+        for number in range(len(tiles)):
+            position[tiles[number]] = number
+        needed = []
+        left = []
+        by_tile = [[] for index in tiles]
+        for number in range(len(constraints)):
+            unknown, remaining = constraints[number]
+            needed.append(remaining)
+            left.append(len(unknown))
+            for index in unknown:
+                by_tile[position[index]].append(number)
+        assignment = [0] * len(tiles)
+        mine_counts = [0] * len(tiles)
+        solutions = [0]
+
+        def assign(number):
+            if number == len(tiles):
+                solutions[0] = solutions[0] + 1
+                for other in range(len(tiles)):
+                    mine_counts[other] = mine_counts[other] + assignment[other]
+                return
+            for value in (0, 1):
+                for constraint in by_tile[number]:
+                    need = needed[constraint] - value
+                    if need < 0 or need > left[constraint] - 1:
+                        break
+                else:
+                    for constraint in by_tile[number]:
+                        needed[constraint] = needed[constraint] - value
+                        left[constraint] = left[constraint] - 1
+                    assignment[number] = value
+                    assign(number + 1)
+                    for constraint in by_tile[number]:
+                        needed[constraint] = needed[constraint] + value
+                        left[constraint] = left[constraint] + 1
+            assignment[number] = 0
+
+        assign(0)
+        if not solutions[0]:
+            return
+        for number in range(len(tiles)):
+            if mine_counts[number] == 0:
+                safe[tiles[number]] = 1
+            elif mine_counts[number] == solutions[0]:
+                mines[tiles[number]] = 1
+
+    def solve(self):
+        """Deduce which unknown tiles are safe and which are mines.
+
+        The single-tile rules are tried first, then the subset rule, and
+        finally an exhaustive search over each independent group of the
+        frontier; each stage only runs if the ones before it found nothing.
+        The total number of mines is not taken into account.
+
+        The function returns a 2-tuple of lists of the (x, y) coordinates
+        of the safe tiles and of the mines found.
+        """
+        constraints = self._constraints()
+        safe = {}
+        mines = {}
+        self._simple(constraints, safe, mines)
+        if not (safe or mines):
+            self._subsets(constraints, safe, mines)
+        if not (safe or mines):
+            for tiles, members in self._components(constraints):
+                if len(tiles) <= self.max_enumeration:
+                    self._enumerate(tiles, members, safe, mines)
+        rows = self.field.rows
+        safe = safe.keys()
+        safe.sort()
+        mines = mines.keys()
+        mines.sort()
+        return ([divmod(index, rows) for index in safe],
+                [divmod(index, rows) for index in mines])
+
+# vim: ts=8 sts=4 sw=4 expandtab
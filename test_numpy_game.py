@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation; either version 2 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA, 02111-1307.
+
+"""Check that numpy_game.NumpyField plays exactly like game.Field.
+
+Usage: python test_numpy_game.py
+
+Every scenario is played from the same seeds on a Field and a NumpyField,
+and the two must agree on every result and on every tile afterwards.  The
+tests are skipped when NumPy is not installed.
+"""
+
+import random, unittest
+
+from game import Field
+
+try:
+    from numpy_game import NumpyField
+except ImportError:
+    NumpyField = None
+
+# The (rows, cols, mines) of the boards, and the seeds they are made from.
+boards = [(9, 9, 10), (16, 16, 40), (16, 30, 99), (1, 12, 3), (12, 1, 3),
+          (40, 40, 100)]
+seeds = range(8)
+
+
+def _tiles(field):
+    """Return the (value, state, count) 3-tuple of every tile of a field."""
+    return [(int(field.values[index]), int(field.states[index]),
+             int(field.counts[index]))
+            for index in xrange(field.rows * field.cols)]
+
+
+def _results(results):
+    """Return open results in a form which does not depend on their order
+    or on the integer types used."""
+    results = [((int(x), int(y)), int(count)) for (x, y), count in results]
+    results.sort()
+    return results
+
+
+@unittest.skipIf(NumpyField is None, "NumPy is not installed")
+class NumpyFieldTest(unittest.TestCase):
+    def pairs(self):
+        """Yield a Field and a NumpyField made alike, for every board and
+        seed."""
+        for rows, cols, mines in boards:
+            for seed in seeds:
+                yield (Field(rows, cols, mines, seed = seed),
+                       NumpyField(rows, cols, mines, seed = seed))
+
+    def assertSameField(self, field, other):
+        self.assertEqual(_tiles(field), _tiles(other))
+        self.assertEqual(field.cleared, other.cleared)
+        self.assertEqual(field.flags, other.flags)
+        self.assertEqual(field.spare, other.spare)
+        self.assertEqual(field.won(), other.won())
+
+    def assertSameOpen(self, field, other, x, y):
+        self.assertEqual(_results(field.open(x, y)),
+                         _results(other.open(x, y)))
+        self.assertSameField(field, other)
+
+    def test_placement(self):
+        for field, other in self.pairs():
+            self.assertSameField(field, other)
+            self.assertEqual(field.fingerprint(), other.fingerprint())
+
+    def test_first_click_on_mine(self):
+        for field, other in self.pairs():
+            mine = list(field.values).index(-1)
+            x, y = divmod(mine, field.rows)
+            self.assertSameOpen(field, other, x, y)
+            self.assertEqual(field.spare, None)
+            self.assertNotEqual(field.values[mine], -1)
+            self.assertEqual(field.fingerprint(), other.fingerprint())
+
+    def test_cascade(self):
+        for field, other in self.pairs():
+            empty = [index for index in xrange(field.rows * field.cols)
+                     if field.counts[index] == 0 and field.values[index] != -1]
+            for index in empty[::7]:
+                self.assertSameOpen(field, other, *divmod(index, field.rows))
+
+    def test_flags_block_cascade(self):
+        for field, other in self.pairs():
+            rows = field.rows
+            empty = [index for index in xrange(rows * field.cols)
+                     if field.counts[index] == 0 and field.values[index] != -1]
+            if len(empty) < 2:
+                continue
+            for index in empty[1::5]:
+                x, y = divmod(index, rows)
+                self.assertEqual(field.flag(x, y), other.flag(x, y))
+            self.assertSameOpen(field, other, *divmod(empty[0], rows))
+            for index in empty[1::5]:
+                self.assertEqual(field.states[index], 1)
+
+    def test_random_play(self):
+        for field, other in self.pairs():
+            rng = random.Random(field.fingerprint())
+            for move in xrange(60):
+                x = rng.randrange(field.cols)
+                y = rng.randrange(field.rows)
+                action = rng.random()
+                if action < 0.2:
+                    self.assertEqual(field.flag(x, y), other.flag(x, y))
+                elif action < 0.4:
+                    self.assertEqual(_results(field.open_adjacent(x, y)),
+                                     _results(other.open_adjacent(x, y)))
+                else:
+                    self.assertEqual(_results(field.open(x, y)),
+                                     _results(other.open(x, y)))
+                self.assertSameField(field, other)
+            for x in xrange(field.cols):
+                for y in xrange(field.rows):
+                    self.assertEqual(field.get_adjacent_info(x, y),
+                                     other.get_adjacent_info(x, y))
+
+    def test_won(self):
+        for field, other in self.pairs():
+            size = field.rows * field.cols
+            mines = [index for index in xrange(size)
+                     if field.values[index] == -1]
+            for index in mines:
+                field.flag(*divmod(index, field.rows))
+                other.flag(*divmod(index, field.rows))
+            self.assertFalse(field.won())
+            tiles = [divmod(index, field.rows) for index in xrange(size)]
+            self.assertEqual(_results(field.open(tiles)),
+                             _results(other.open(tiles)))
+            self.assertSameField(field, other)
+            self.assertTrue(field.won())
+            field.lose = other.lose = 1
+            self.assertEqual(field.won(), -1)
+            self.assertEqual(other.won(), -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# vim: ts=8 sts=4 sw=4 expandtab
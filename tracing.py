@@ -0,0 +1,136 @@
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation; either version 2 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA, 02111-1307.
+
+"""Record how long the parts of the main loop take.
+
+Tracing is off unless it is asked for, with blindmine.py's --trace option
+or the BLINDMINE_TRACE environment variable, and when it is off nothing in
+this module is used.
+"""
+
+from timeit import default_timer
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+formats = ('chrome', 'json')
+
+# The methods blindmine.run() times on the interface and on every Field.
+ui_methods = ('reset', 'get_input', 'feedback', 'update_game', 'wait')
+field_methods = ('open', 'iter_open', 'open_adjacent', 'flag', 'read',
+                 'get_adjacent_info', 'won', 'playtime')
+
+
+class Tracer:
+    """Keep the most recent timed spans in a ring buffer.
+
+    A span is a name, a start time, a duration, and the number of the main
+    loop iteration it happened in.  Once the buffer is full, every new span
+    replaces the oldest one, so a long game costs no more memory than a
+    short one.
+
+    Methods of other objects are timed by replacing them with wrappers
+    through instrument(); spans can also be recorded directly with span().
+    """
+    def __init__(self, size = 100000):
+        self.events = [None] * size
+        self.next = 0
+        self.count = 0
+        self.iteration = 0
+        self.clock = default_timer
+        self.origin = self.clock()
+
+    def span(self, name, start):
+        """Record a span which started at start and ends now.
+
+        start is a value returned by self.clock().
+        """
+        now = self.clock()
+        self.events[self.next] = (name, start, now - start, self.iteration)
+        self.next = (self.next + 1) % len(self.events)
+        self.count = self.count + 1
+
+    def instrument(self, obj, name, label = None):
+        """Time every call to a method of an object.
+
+        This function replaces the method with a wrapper which records a
+        span for each call.  The wrapper is set on obj itself, so other
+        instances of its class are untouched.
+
+        name is the name of the method.  The spans are named after it,
+        prefixed with the name of obj's class; if label is given, it is
+        instead called with the method's arguments and returns the span's
+        name.
+        """
+        method = getattr(obj, name)
+        default = '%s.%s' % (obj.__class__.__name__, name)
+        tracer = self
+
+        def traced(*args, **kwargs):
+            start = tracer.clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                if label is None:
+                    tracer.span(default, start)
+                else:
+                    tracer.span(label(*args, **kwargs), start)
+        setattr(obj, name, traced)
+
+    def get_events(self):
+        """Return the recorded spans, oldest first."""
+        if self.count <= len(self.events):
+            return self.events[:self.next]
+        return self.events[self.next:] + self.events[:self.next]
+
+    def dump(self, filename, format = 'chrome'):
+        """Write the recorded spans to a file.
+
+        format is 'chrome' for the Trace Event Format read by Chrome's
+        about:tracing and Perfetto, or 'json' for a plain list of spans with
+        their start times and durations in seconds.  Either way, times are
+        measured from when the Tracer was created, and the number of spans
+        dropped because the buffer was full is included.
+        """
+        events = self.get_events()
+        dropped = self.count - len(events)
+        if format == 'chrome':
+            trace = {'traceEvents': [{'name': name, 'ph': 'X', 'pid': 0,
+                                      'tid': 0,
+                                      'ts': (start - self.origin) * 1e6,
+                                      'dur': duration * 1e6,
+                                      'args': {'iteration': iteration}}
+                                     for name, start, duration, iteration
+                                     in events],
+                     'displayTimeUnit': 'ms',
+                     'otherData': {'dropped': dropped}}
+        elif format == 'json':
+            trace = {'dropped': dropped,
+                     'spans': [{'name': name,
+                                'start': start - self.origin,
+                                'duration': duration,
+                                'iteration': iteration}
+                               for name, start, duration, iteration
+                               in events]}
+        else:
+            raise ValueError, "unknown trace format %s" % format
+        output = open(filename, 'w')
+        try:
+            json.dump(trace, output)
+        finally:
+            output.close()
+
+# vim: ts=8 sts=4 sw=4 expandtab
@@ -4,6 +4,9 @@ class Option:
 	self.cols = 9
 	self.mines = 10
 	self.lang = 'ko'
+	self.seed = None
+	self.trace = None
+	self.trace_format = 'chrome'
 
     def load(self):
 	pass